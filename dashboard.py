@@ -11,6 +11,7 @@ import os
 import socket
 import pyodbc
 from modules.logger_config import setup_logger 
+from modules.ConnectionPool import build_connection_string, get_pool
 from version import __version__
 
 class DashboardWindow(QMainWindow):
@@ -159,16 +160,19 @@ class DashboardWindow(QMainWindow):
                 config = json.load(f)
 
             # Prepare the connection string
-            connection_string = (
-                f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-                f"SERVER={config['server']};"
-                f"DATABASE={config['database']};"
-                f"UID={config['username']};"
-                f"PWD={config['password']};"
+            connection_string = build_connection_string(
+                config['server'],
+                config['database'],
+                config['username'],
+                config['password'],
+                config.get('trusted_connection', False),
             )
 
-            # Try to establish a connection to the database
-            with pyodbc.connect(connection_string, timeout=5) as connection:
+            # Check a connection out of the shared pool; idle ones are health checked before reuse
+            # Same sizes as the main window's pool, which may be the one this returns
+            pool = get_pool(connection_string, config.get('poolMaxSize', 4), config.get('poolIdleTimeout', 300))
+            with pool.connection(timeout=5) as connection:
+                connection.cursor().execute("SELECT 1;").fetchone()
                 # Connection successful
                 self.logger.info("Successfully connected to the database.")
                 self.lbl_resultDatabase.setText("✅️")
@@ -1,116 +1,229 @@
 import os
-import re
 import sys
+import time
 import pyodbc
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QLineEdit, QTableWidget, QTableWidgetItem, QMessageBox, QGridLayout, QHBoxLayout, QAction, QMainWindow, QProgressBar, QComboBox, QCheckBox
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QLineEdit, QTableView, QMessageBox, QGridLayout, QHBoxLayout, QAction, QMainWindow, QProgressBar, QComboBox, QCheckBox
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QSettings
-from PyQt5.QtGui import QIcon, QBrush, QColor
+from PyQt5.QtGui import QIcon
 import usb
-import usb.core
-import usb.util
 import usb.backend.libusb1
 import requests
-from bisect import bisect_left, bisect_right
+import heapq
+import threading
+import multiprocessing
 from check_password import PasswordCheck
 from dashboard import DashboardWindow
-from modules import Configurations
 from modules.logger_config import setup_logger
-from modules.SendCommand import SendCommand
 from modules.Configurations import BarcodeConfig
+from modules.CatalogReplica import CatalogReplica
+from modules.CatalogStore import CatalogStore
+from modules.CatalogAdapter import SqlServerItemAdapter, SqlitePluAdapter, get_adapter
+from modules.CatalogSnapshot import CatalogSnapshot, MappedCatalog
+from modules.CatalogQuery import CatalogQuery
+from modules.ConnectionPool import build_connection_string, get_pool, close_pool
+from modules.PushdownSearch import SqlServerPushdownSearch, SqlitePushdownSearch
+from modules.LocationPrices import LocationPriceCache
+from modules.PluSearchIndex import PluSearchIndex
+from modules.PrefixIndex import PrefixIndex
+from modules.TokenIndex import TokenIndex
+from modules.NgramIndex import NgramIndex, is_cjk
+from modules.FuzzyIndex import FuzzyIndex
+from modules.QueryCache import QueryCache
+from modules.ShardedSearch import ShardedSearch
+from modules.FacetIndex import FacetIndex
+from modules.SortIndex import SortIndex
+from modules.ItemTableModel import ItemTableModel
+from modules.DisplayRowCache import DisplayRowCache
+from modules.SelectionBasket import SelectionBasket
+from modules.LabelRenderer import LabelRenderer
+from modules.LabelTransport import LabelTransport
 from remark import RemarkDialog
 from version import __version__
 import subprocess
 import sqlite3
 
 
-class FilterItemsBinaryThread(QThread):
-    items_filtered = pyqtSignal(list)  # Signal to emit filtered items
+class SearchWorker(QThread):
+    """
+    Long-lived thread running catalog searches one at a time, latest query wins.
 
-    def __init__(self, all_items, search_text, sort_by='barcode'):
-        super().__init__()
-        self.all_items = all_items
-        self.search_text = search_text.lower()
-        self.sort_by = sort_by
-
-    def binary_search(self, items, target: str):
-        """Perform binary search for the target on pre-sorted items."""
-        if self.sort_by == 'description':
-            item_codes = [str(item[1]).lower() for item in items]
-        elif self.sort_by == 'barcode':
-            item_codes = [str(item[4]).lower() for item in items]
-
-        index = bisect_left(item_codes, target)
+    A submitted request replaces any request still waiting, and bumps the
+    generation, which a running search polls through cancelled() to give up
+    early. Results carry their generation so the UI can drop overtaken ones,
+    and their latency from submit to result.
+    """
+    results_ready = pyqtSignal(int, int, object, str, float)  # Generation, catalog generation, row ids, status note, seconds
+    error_occurred = pyqtSignal(str)
 
-        if index < len(item_codes) and item_codes[index] == target:
-            return [items[index]]  # Return found item as a single-item list for uniform display
-        return []
+    def __init__(self, search):
+        super().__init__()
+        self.search = search  # search(*request, cancelled) -> (catalog generation, row ids, note), or None when cancelled
+        self.lock = threading.Lock()  # Held while searching; the UI takes it to change the catalog in place
+        self.generation = 0
+        self._request = None
+        self._stopping = False
+        self._condition = threading.Condition()
+
+    def submit(self, *request):
+        with self._condition:
+            self.generation += 1
+            self._request = (self.generation, time.perf_counter(), request)
+            self._condition.notify()
+        return self.generation
+
+    def cancel(self):
+        """Give up the running search and any waiting one, e.g. before the catalog is replaced."""
+        with self._condition:
+            self.generation += 1
+            self._request = None
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self.generation += 1  # Cancels a running search
+            self._condition.notify()
+        self.wait()
 
     def run(self):
-        # Sort items before binary search
-        if self.sort_by == "description":
-            sorted_items = sorted(self.all_items, key=lambda x: x[1].lower())
-        elif self.sort_by == 'barcode':
-            sorted_items = sorted(self.all_items, key=lambda x: x[4].lower())
-
-        # Apply binary search if there is search text; otherwise return all items
-        if self.search_text:
-            filtered_items = self.binary_search(sorted_items, self.search_text)
-        else:
-            filtered_items = sorted_items
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                generation, submitted, request = self._request
+                self._request = None
+
+            cancelled = lambda: self.generation != generation
+            try:
+                with self.lock:
+                    result = self.search(*request, cancelled)
+            except Exception as e:
+                self.error_occurred.emit(str(e))
+                continue
+            if result is not None and not cancelled():
+                catalog_generation, row_ids, note = result
+                self.results_ready.emit(generation, catalog_generation, row_ids, note, time.perf_counter() - submitted)
 
-        # Emit the filtered items
-        self.items_filtered.emit(filtered_items)
 
 class FetchItemsThread(QThread):
-    items_fetched = pyqtSignal(list)
+    items_fetched = pyqtSignal(object)  # CatalogStore with the complete catalog
+    items_batch = pyqtSignal(object, list)  # CatalogStore being filled, sorted row ids of the new batch
+    progress = pyqtSignal(int, int)  # Rows fetched so far, total rows (0 when unknown)
+    fetch_cancelled = pyqtSignal()
+    connection_opened = pyqtSignal(object)  # Emitted when the worker had to open the SQL Server connection itself
+    sync_token_ready = pyqtSignal(object)  # Change tracking version the fetched catalog is consistent with
+    pushdown_selected = pyqtSignal(int)  # Catalog row count exceeded the threshold, nothing was loaded
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, db_path_or_connection, location, use_sqlite):
+    def __init__(self, db_path_or_connection, location, use_sqlite, batch_size=2000, replica=None, pushdown_threshold=0,
+                 search_index=None):
         super().__init__()
         self.config = BarcodeConfig()
-        self.db_source = db_path_or_connection  # Can be path or pyodbc connection
+        self.logger = setup_logger("FetchItemsThread")
+        self.db_source = db_path_or_connection  # SQLite path, or a CatalogQuery for SQL Server
         self.location = location
         self.use_sqlite = use_sqlite
+        self.batch_size = max(1, int(batch_size))
+        self.replica = replica  # CatalogReplica refreshed after a successful SQL Server fetch
+        self.pushdown_threshold = pushdown_threshold  # 0 always loads the full catalog
+        self.search_index = search_index  # PluSearchIndex brought up to date after a SQLite fetch
+        self.adapter = SqlitePluAdapter() if use_sqlite else SqlServerItemAdapter()
+        self._cancelled = False
+
+    def use_pushdown(self, total):
+        """Return True, after telling the UI, when the catalog is too large to load into memory."""
+        if self.pushdown_threshold > 0 and total > self.pushdown_threshold:
+            self.logger.debug(f"{total} rows exceed the pushdown threshold of {self.pushdown_threshold}")
+            self.pushdown_selected.emit(total)
+            return True
+        return False
+
+    def cancel(self):
+        """Ask the worker to stop after the batch it is currently reading."""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def count_rows(self, cursor, query):
+        """Return the expected row count for progress reporting, or 0 if it cannot be determined."""
+        try:
+            cursor.execute(query)
+            row = cursor.fetchone()
+            return int(row[0]) if row else 0
+        except Exception as e:
+            self.logger.debug(f"Could not count rows for progress: {e}")
+            return 0
+
+    def stream_items(self, cursor, total):
+        """
+        Pull rows with fetchmany into a CatalogStore, emitting each sorted batch as it arrives.
+
+        The adapter converts each database row to CatalogStore.COLUMNS order. Every batch
+        is sorted by barcode before it is emitted, so the final sort only has to
+        merge the already ordered runs. The other columns' sort orders are then
+        built too. Returns None when cancelled.
+        """
+        catalog = CatalogStore(self.adapter.source)
+        to_row = self.adapter.to_row
+        order = []
+        while not self._cancelled:
+            batch = cursor.fetchmany(self.batch_size)
+            if not batch:
+                break
+            row_ids = catalog.extend(to_row(row) for row in batch)
+            row_ids.sort(key=catalog.barcode_key)
+            order.extend(row_ids)
+            self.items_batch.emit(catalog, row_ids)
+            self.progress.emit(len(catalog), max(total, len(catalog)))
+
+        if self._cancelled:
+            return None
+
+        catalog.sort(order)  # Timsort merges the sorted runs from each batch
+        for column in CatalogStore.COLUMNS:
+            catalog.permutation(column)  # Every sort order is built here, before the catalog is searched
+        return catalog
 
     def run(self):
         print("[DEBUG] FetchItemsThread started")
 
         if not self.use_sqlite:
             # SQL Server (pyodbc)
-            cursor = None
+            query = self.db_source
             try:
-                connection = self.db_source  # pyodbc connection
-                cursor = connection.cursor()
-                query = f"""
-                WITH BaseItems AS (
-                    SELECT
-                        u.ItemCode,
-                        i.Description AS DescriptionWithUOM,
-                        u.UOM,
-                        u.Price AS DefaultUnitPrice,
-                        u.Cost,
-                        ISNULL(NULLIF(u.BarCode, ''), i.ItemCode) AS Barcode,
-                        ISNULL(p.Location, 'HQ') AS Location,
-                        ISNULL(p.Price, u.Price) AS PosUnitPrice
-                    FROM dbo.ItemUOM u
-                    LEFT JOIN dbo.Item i ON u.ItemCode = i.ItemCode
-                    LEFT JOIN dbo.PosPricePlan p ON u.ItemCode = p.ItemCode AND p.Location = '{self.location}'
-                )
-                SELECT * FROM BaseItems;
-                """
-                cursor.execute(query)
-                items = cursor.fetchall()
-                self.items_fetched.emit(items)
+                # Offline start: the query connects here so a slow server never blocks the UI thread
+                was_connected = query.is_connected()
+                connection = query.connection
+                if not was_connected:
+                    self.connection_opened.emit(connection)
+                # Read the token before the fetch so changes made during it are picked up by the next delta
+                sync_token = query.sync_token()
+                try:
+                    total = query.count_items()
+                except pyodbc.Error as e:
+                    self.logger.debug(f"Could not count rows for progress: {e}")
+                    total = 0
+                if self.use_pushdown(total):
+                    return
+                cursor = query.catalog(self.location)
+                catalog = self.stream_items(cursor, total)
+                if catalog is None:
+                    query.discard("catalog")  # Drop the half-read result so the connection is free again
+                    self.fetch_cancelled.emit()
+                else:
+                    self.logger.debug(f"Query timings: {query.timing_summary()}")
+                    self.sync_token_ready.emit(sync_token)
+                    self.items_fetched.emit(catalog)
+                    if self.replica is not None:
+                        self.replica.save(self.location, catalog.records(), sync_token)
             except pyodbc.Error as e:
+                query.close(discard=True)  # The connection may be broken; the next fetch checks out a fresh one
                 self.error_occurred.emit(f"Error fetching items from SQL Server: {e}")
             except Exception as e:
+                query.discard("catalog")
                 self.error_occurred.emit(f"Unexpected error in SQL Server fetch: {e}")
-            finally:
-                if cursor:
-                    try:
-                        cursor.close()
-                    except Exception as e:
-                        print(f"Error closing SQL Server cursor: {e}")
         else:
             # SQLite (must create connection inside thread)
             print("[DEBUG] Using SQLite mode for fetching items")
@@ -120,13 +233,21 @@ class FetchItemsThread(QThread):
                 connection = sqlite3.connect(self.db_source)  # Create connection in this thread
                 cursor = connection.cursor()
                 print("[DEBUG] SQLite cursor created")
-                query = "SELECT barCode, name, price FROM Tbl_Plu;"
-                cursor.execute(query)
+                total = self.count_rows(cursor, self.adapter.COUNT_SQL)
+                if self.use_pushdown(total):
+                    return
+                cursor.execute(self.adapter.SELECT_SQL)
                 print("[DEBUG] Query executed")
-                items = cursor.fetchall()
-                print(f"[DEBUG] Retrieved {len(items)} items from SQLite")
-                self.items_fetched.emit(items)
-                print("[DEBUG] Emitted items to main thread")
+                catalog = self.stream_items(cursor, total)
+                if catalog is None:
+                    self.logger.debug("SQLite fetch cancelled")
+                    self.fetch_cancelled.emit()
+                else:
+                    print(f"[DEBUG] Retrieved {len(catalog)} items from SQLite")
+                    self.items_fetched.emit(catalog)
+                    print("[DEBUG] Emitted items to main thread")
+                    if self.search_index is not None:
+                        self.search_index.ensure()
             except Exception as e:
                 print(f"[DEBUG] Exception occurred in SQLite block: {e}")
                 self.error_occurred.emit(f"SQLite error: {e}")
@@ -140,12 +261,346 @@ class FetchItemsThread(QThread):
                     connection.close()
 
 
+class PushdownSearchThread(QThread):
+    """Run one page of a pushdown search off the UI thread."""
+    results_ready = pyqtSignal(object, object)  # CatalogStore holding the page, key of the next page or None
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, backend, mode, text, limit, after=None):
+        super().__init__()
+        self.backend = backend
+        self.mode = mode
+        self.text = text
+        self.limit = limit
+        self.after = after
+
+    def run(self):
+        try:
+            rows, next_key = self.backend.search(self.mode, self.text, self.limit, self.after)
+            page = CatalogStore(self.backend.source)
+            page.extend(rows)
+            page.sort()
+            self.results_ready.emit(page, next_key)
+        except Exception as e:
+            self.error_occurred.emit(f"Error searching the database: {e}")
+
+
+class DeltaRefreshThread(QThread):
+    """
+    Fetch only the catalog rows of items changed since the last sync token.
+
+    Changes are read with SQL Server change tracking on ItemUOM, Item and
+    PosPricePlan. When change tracking is off or the token is older than the
+    retention period, delta_unavailable is emitted so a full fetch can be used.
+    """
+    delta_fetched = pyqtSignal(object, list, list, object)  # New sync token, changed item codes, replacement rows, copied catalog
+    delta_unavailable = pyqtSignal(str)
+    full_fetch_needed = pyqtSignal(str)  # The changes cannot be applied as a delta, the catalog would go stale
+    connection_opened = pyqtSignal(object)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, query, location, sync_token, replica=None, catalog=None):
+        super().__init__()
+        self.logger = setup_logger("DeltaRefreshThread")
+        self.query = query  # CatalogQuery, connected lazily in this thread if needed
+        self.location = location
+        self.sync_token = sync_token
+        self.replica = replica
+        self.catalog = catalog  # Copied here when it is a read-only MappedCatalog that has to change
+
+    def run(self):
+        try:
+            was_connected = self.query.is_connected()
+            connection = self.query.connection
+            if not was_connected:
+                self.connection_opened.emit(connection)
+
+            new_token = self.query.sync_token()
+            if new_token is None:
+                self.delta_unavailable.emit("Change tracking is not enabled on the database")
+                return
+
+            reason = self.query.check_sync_token(self.sync_token)
+            if reason is not None:
+                self.delta_unavailable.emit(reason)
+                return
+
+            changed_sql, reason = self.query.changed_item_codes_sql()
+            if changed_sql is None:
+                self.delta_unavailable.emit(reason)
+                return
+
+            reason = self.query.check_deleted_rows(self.sync_token)
+            if reason is not None:
+                self.full_fetch_needed.emit(reason)
+                return
+
+            changed_item_codes = self.query.changed_item_codes(changed_sql, self.sync_token)
+            rows = []
+            if changed_item_codes:
+                rows = self.query.changed_rows(changed_sql, self.sync_token, self.location)
+
+            self.logger.debug(f"Delta refresh found {len(changed_item_codes)} changed item codes")
+            self.logger.debug(f"Query timings: {self.query.timing_summary()}")
+            if self.isInterruptionRequested():
+                return  # The app is closing; the token is not advanced, so the next start fetches these again
+            if self.replica is not None:
+                self.replica.apply_delta(self.location, changed_item_codes, rows, new_token)
+            store = None
+            if changed_item_codes and isinstance(self.catalog, MappedCatalog):
+                store = self.catalog.to_store()
+            self.delta_fetched.emit(new_token, changed_item_codes, rows, store)
+        except pyodbc.Error as e:
+            self.query.close(discard=True)
+            self.error_occurred.emit(f"Error fetching changed items from SQL Server: {e}")
+        except Exception as e:
+            self.error_occurred.emit(f"Unexpected error in delta refresh: {e}")
+
+
+class SearchIndexThread(QThread):
+    """Build the text search indexes of a catalog off the UI thread."""
+    indexes_ready = pyqtSignal(int, object)  # Catalog generation the indexes were built for, name -> index
+    fuzzy_ready = pyqtSignal(int, object)  # Same, for the fuzzy indexes built after the exact ones
+
+    def __init__(self, catalog, generation):
+        super().__init__()
+        self.logger = setup_logger("SearchIndexThread")
+        self.catalog = catalog
+        self.generation = generation
+
+    def run(self):
+        code_column = get_adapter(self.catalog.source).code_column
+        indexes = {
+            "facets": FacetIndex(),
+            "description_tokens": TokenIndex("description"),
+            "description_ngrams": NgramIndex("description"),
+            "code_ngrams": NgramIndex(code_column),
+        }
+        for name, index in indexes.items():
+            if index.build(self.catalog, self.isInterruptionRequested) is None:
+                return
+            self.logger.debug(f"Search index {name} built")
+        self.indexes_ready.emit(self.generation, indexes)
+
+        # Exact search is already served while the slower typo-tolerant indexes build
+        fuzzy_indexes = {
+            "description_fuzzy": FuzzyIndex("description"),
+            "code_fuzzy": FuzzyIndex(code_column, tokens=False, max_distance=1),  # Codes share long prefixes
+        }
+        for name, index in fuzzy_indexes.items():
+            if index.build(self.catalog, self.isInterruptionRequested) is None:
+                return
+            self.logger.debug(f"Fuzzy index {name} built with {len(index.terms)} terms")
+        self.fuzzy_ready.emit(self.generation, fuzzy_indexes)
+
+
+class ShardedSearchThread(QThread):
+    """
+    Copy a large catalog's search keys to shared memory off the UI thread,
+    for a running ShardedSearch or else for one started here with its search processes.
+    """
+    engine_ready = pyqtSignal(int, object)  # Catalog generation, new ShardedSearch
+    keys_ready = pyqtSignal(int, object)  # Catalog generation, SharedKeys for the running ShardedSearch
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, catalog, generation, columns, engine=None):
+        super().__init__()
+        self.logger = setup_logger("ShardedSearchThread")
+        self.catalog = catalog
+        self.generation = generation
+        self.columns = columns
+        self.running_engine = engine
+        self.engine = None  # Kept so the app can close them if the signal is never delivered
+        self.keys = None
+
+    def run(self):
+        try:
+            if self.running_engine is not None:
+                self.keys = self.running_engine.copy_keys(self.catalog, self.columns)
+                self.logger.debug(f"Sharded search keys copied for {self.keys.rows} rows")
+                self.keys_ready.emit(self.generation, self.keys)
+                return
+            self.engine = ShardedSearch(self.catalog, self.columns)
+            self.logger.debug(f"Sharded search ready over {self.engine.rows} rows in {len(self.engine.shards)} shards")
+            self.engine_ready.emit(self.generation, self.engine)
+        except Exception as e:
+            self.error_occurred.emit(f"Could not start the sharded search: {e}")
+
+
+class DisplayRowsWorker(QThread):
+    """
+    Long-lived thread formatting the table text of rows ahead of the item table, latest request wins.
+
+    A submitted request replaces any request still waiting, and the one
+    being formatted is given up after its current batch, so the UI never
+    waits for it. Batches carry the DisplayRowCache stamp they were
+    formatted for, and the cache drops the ones that have gone stale.
+    """
+    rows_ready = pyqtSignal(int, object)  # DisplayRowCache stamp, row id -> column texts
+
+    def __init__(self, lock, batch_size=2000):
+        super().__init__()
+        self.logger = setup_logger("DisplayRowsWorker")
+        self.lock = lock  # The search worker's, held by the UI while it changes the catalog in place
+        self.batch_size = batch_size
+        self._request = None
+        self._stopping = False
+        self._condition = threading.Condition()
+
+    def submit(self, catalog, row_ids, hide_cost, stamp):
+        with self._condition:
+            self._request = (catalog, row_ids, hide_cost, stamp)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self.wait()
+
+    def superseded(self):
+        return self._request is not None or self._stopping
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                catalog, row_ids, hide_cost, stamp = self._request
+                self._request = None
+
+            for start in range(0, len(row_ids), self.batch_size):
+                if self.superseded():
+                    break  # Only the rows now on screen matter
+                try:
+                    with self.lock:
+                        rows = {
+                            row_id: DisplayRowCache.format_row(catalog, row_id, hide_cost)
+                            for row_id in row_ids[start:start + self.batch_size]
+                        }
+                except Exception as e:
+                    self.logger.debug(f"Skipped formatting rows: {e}")  # The catalog was closed; the rows format on paint
+                    break
+                self.rows_ready.emit(stamp, rows)
+
+
+class PrintJobThread(QThread):
+    """
+    Render and send the labels of catalog rows over one printer connection, off the UI thread.
+
+    Rows are read from the catalog in batches under the search worker's lock
+    and each batch goes to the printer in one write, so a job of any size
+    only keeps one batch of labels in memory.
+    """
+    progress = pyqtSignal(int, int, int, float)  # Rows sent, rows in the job, labels sent, seconds since the start
+    completed = pyqtSignal(int, int, float, bool)  # Rows sent, labels sent, seconds, whether it was cancelled
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, catalog, rows, renderer, transport, lock, batch_size=200):
+        super().__init__()
+        self.catalog = catalog
+        self.rows = rows  # (row id, copies)
+        self.renderer = renderer
+        self.transport = transport
+        self.lock = lock
+        self.batch_size = batch_size
+        self.total = len(rows)  # Rows in the job, 0 when unknown
+
+    def batches(self):
+        """Yield the (record, copies) of the job, batch_size rows at a time."""
+        for start in range(0, len(self.rows), self.batch_size):
+            with self.lock:  # Not while the UI changes the catalog in place
+                records = [(self.catalog.record(row_id), copies) for row_id, copies in self.rows[start:start + self.batch_size]]
+            yield records
+
+    def run(self):
+        started = time.perf_counter()
+        sent = labels = 0
+        cancelled = False
+        try:
+            self.transport.open()
+            try:
+                for records in self.batches():
+                    if self.isInterruptionRequested():
+                        cancelled = True
+                        break
+                    clear = self.transport.send_clear
+                    self.transport.send("".join(self.renderer.command(record, copies, clear) for record, copies in records))
+                    sent += len(records)
+                    labels += sum(copies for _, copies in records)
+                    self.progress.emit(sent, self.total, labels, time.perf_counter() - started)
+            finally:
+                self.transport.close()
+        except Exception as e:
+            self.error_occurred.emit(f"Printing stopped after {sent} items: {e}")
+            return
+        self.completed.emit(sent, labels, time.perf_counter() - started, cancelled)
+
+
+class PushdownPrintJobThread(PrintJobThread):
+    """
+    Print every row of a pushdown search, reading it from the database a page
+    at a time with the same keyset paging as More Results, so the job never
+    holds more than one page however many rows match.
+    """
+
+    def __init__(self, backend, mode, text, copies, renderer, transport, page_size=500):
+        super().__init__(None, [], renderer, transport, None, page_size)
+        self.backend = backend
+        self.mode = mode
+        self.text = text
+        self.copies = copies  # SelectionBasket.row_key of picked rows -> copies; other rows get one label
+        self.total = 0  # Only known once the last page is read
+
+    def batches(self):
+        after = None
+        while True:
+            rows, after = self.backend.search(self.mode, self.text, self.batch_size, after)
+            # Rows are in CatalogStore.COLUMNS order, keyed like SelectionBasket.row_key
+            yield [(row, self.copies.get((row[0], row[2], row[5]), 1)) for row in rows]
+            if after is None:
+                return
+
+
+class LocationPricesThread(QThread):
+    """Load a location's price plan, and the list of price plan locations, into a LocationPriceCache."""
+    prices_loaded = pyqtSignal(str, object, object)  # Location, its (ItemCode, UOM) -> price overlay, copied catalog
+    locations_loaded = pyqtSignal(list)
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, cache, pool, location=None, catalog=None):
+        super().__init__()
+        self.cache = cache
+        self.pool = pool
+        self.location = location
+        self.catalog = catalog  # Copied here when it is a read-only MappedCatalog that has to change
+
+    def run(self):
+        try:
+            # A pooled connection of its own, so it never competes with a fetch on the CatalogQuery cursors
+            with self.pool.connection(timeout=30) as connection:
+                if self.cache.locations is None:
+                    self.locations_loaded.emit(self.cache.load_locations(connection))
+                if self.location is not None:
+                    prices = self.cache.load(connection, self.location)
+                    store = self.catalog.to_store() if isinstance(self.catalog, MappedCatalog) else None
+                    self.prices_loaded.emit(self.location, prices, store)
+        except pyodbc.Error as e:
+            self.error_occurred.emit(f"Error loading location prices from SQL Server: {e}")
+
+
 class BarcodeApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.logger = setup_logger('BarcodeApp')  # Use a logger specific to the DashboardWindow
         self.logger.info("Initializing BarcodeApp...")
         self.config = BarcodeConfig()
+        self.display_rows = DisplayRowCache()  # Formatted text of the item table rows, read by the model
+        self.basket = SelectionBasket()  # Rows picked for printing, kept across searches
+        self.print_job_thread = None
+        self.config_reload_pending = False  # Settings changed during a print job
         self.initUI()
         self.input_timer = QTimer()
         self.input_timer.setSingleShot(True)
@@ -155,18 +610,85 @@ class BarcodeApp(QMainWindow):
         self.setWindowIcon(QIcon(self.resource_path(("images/logo.ico"))))
         self.db_connected = False
         self.connection = None
+        self.connection_string = None
+        self.catalog_query = None  # Owns the prepared SQL Server statements across refreshes
         self.sqlite_connection = None
         self.warning_shown = False
         self.settings = QSettings("MyCompany", "MyApp")  # Customize organization and app names
         self.restore_column_widths() 
-        self.connect_to_database()
+        self.fetch_items_thread = None
+        self.delta_refresh_thread = None
+        self.delta_fallback = False
+        self.sync_token = None
+        self.catalog = None  # CatalogStore shared by search, display and printing
+        self.displayed_catalog = None
+        self.pushdown = None  # Set instead of catalog when the catalog is too large to load
+        self.pushdown_thread = None
+        self.pushdown_request = None  # (mode, text, next page key) of the results on screen
+        self.pending_pushdown = None
+        self.catalog_location = None  # Location whose prices are joined into the catalog
+        self.replica_location = None  # Location the replica was last written for from this catalog
+        self.location_prices = LocationPriceCache()
+        self.location_prices_thread = None
+        self.replica = CatalogReplica(self.config.get_replica_path())
+        self.replica_loaded = False  # A local copy (snapshot or replica) is on screen
+        self.snapshot = CatalogSnapshot(self.config.get_replica_path())
+        self.snapshot_current = False  # The snapshot matches the unchanged SQLite file, no fetch needed
+        self.retired_catalogs = []  # Replaced MappedCatalogs still read by a worker, unmapped when it finishes
+        self.catalog_source = None  # Snapshot key of the source the catalog was read from
+        self.fetch_source = None
+        self.plu_index = None
+        self.prefix_indexes = {}  # Column -> PrefixIndex over indexed_catalog
+        self.indexed_catalog = None
+        self.catalog_generation = 0  # Bumped when a catalog with different row ids is installed
+        self.search_indexes = None  # Text indexes of this catalog generation, by name, once built
+        self.search_index_thread = None
+        self.search_index_pending = []  # Deltas applied while the indexes were being built
+        self.fuzzy_indexes = None  # Typo-tolerant indexes, built after the search indexes
+        self.fuzzy_pending = []
+        self.query_cache = QueryCache()  # Recent search results, keyed by catalog generation and version
+        self.search_latency = None  # Seconds from submitting the last displayed search to its results
+        self.sharded_search = None  # ShardedSearch of the current catalog when it is large enough
+        self.sharded_search_thread = None
+        self.sharded_search_stale = False  # Its keys are of rows that have since changed, so searches skip it
+        self.sharded_search_pending = False  # The rows changed while its keys were being copied
+        self.facet_prices_stale = False  # Location prices changed while the facets were being built
+        self.search_mode = 'barcode'  # Last search, repeated when a facet filter changes
+        self.search_text = ''
+        self.sort_columns = ()  # Catalog columns the results are sorted by, most significant first
+        self.sort_descending = False
+        self.displayed_sort = ()  # Columns the rows in the table are sorted by
+        self.sort_indexes = {}  # Column -> SortIndex, built and read on the search worker
+        self.search_worker = SearchWorker(self.run_search)
+        self.search_worker.results_ready.connect(self.handle_search_results)
+        self.search_worker.error_occurred.connect(self.handle_search_error)
+        self.search_worker.start()
+        self.display_rows_worker = DisplayRowsWorker(self.search_worker.lock)
+        self.display_rows_worker.rows_ready.connect(self.handle_display_rows_ready)
+        self.display_rows_worker.start()
+
+        # Show the local snapshot or replica first; the database is then revalidated in the background
+        if self.load_snapshot() or self.load_replica():
+            self.logger.info("Local catalog loaded, deferring the database connection to the fetch worker.")
+        else:
+            self.connect_to_database()
         self.loadStylesheet()
         self.showMaximized()
-        self.fetch_items_thread = None
-        self.items = []
 
-        # Start fetching items on a separate thread
-        self.start_fetch_items()
+        # Start fetching items on a separate thread; a replica with a sync token only needs the changes
+        if self.snapshot_current:
+            self.logger.info("SQLite file unchanged since the snapshot was written, skipping the fetch.")
+        elif self.replica_loaded and self.sync_token is not None:
+            self.refresh_items(full_fetch_fallback=True)
+        else:
+            self.start_fetch_items()
+
+        # Periodic incremental refresh, only active while a sync token is known
+        self.delta_timer = QTimer(self)
+        self.delta_timer.timeout.connect(self.refresh_items)
+        interval = self.config.get_delta_refresh_interval()
+        if interval > 0:
+            self.delta_timer.start(interval * 1000)
 
     def update_logging(self):
         """ This method will update logging based on the config setting """
@@ -176,10 +698,25 @@ class BarcodeApp(QMainWindow):
     def start_timer(self):
         self.input_timer.start(400)
 
-    def handle_config_change(self):
+    def handle_config_change(self, key=None, value=None):
         """
         Handle changes in the JSON config file.
+
+        A location change only re-prices the loaded catalog when possible;
+        every other change reconnects and refetches.
         """
+        if key == "location" and self.switch_location(value):
+            return
+        if key == "hideCost":
+            self.item_model.set_hide_cost(bool(value))  # Only the cost column changes
+            return
+        if self.print_job_thread is not None and self.print_job_thread.isRunning():
+            # A pushdown print job pages through the connection the reload closes; reload once it is done
+            self.config_reload_pending = True
+            self.statusBar().showMessage("Settings changed, reloading when printing is finished.")
+            return
+        self.config_reload_pending = False
+
         self.logger.info("Configuration file changed. Reloading...")
 
         try:
@@ -192,11 +729,46 @@ class BarcodeApp(QMainWindow):
             self.check_version()
             self.progressBar.setValue(35)
 
-            if self.db_connected:
+            # Stop any fetch still streaming from the connection we are about to close
+            self.cancel_fetch_items()
+            if self.fetch_items_thread is not None:
+                self.fetch_items_thread.wait()
+            if self.delta_refresh_thread is not None:
+                self.delta_refresh_thread.wait()
+            self.pending_pushdown = None
+            if self.pushdown_thread is not None:
+                self.pushdown_thread.wait()
+            self.pushdown = None
+            if self.location_prices_thread is not None:
+                self.location_prices_thread.wait()
+            self.location_prices = LocationPriceCache()  # The server or database may have changed too
+
+            if self.catalog_query is not None:
+                self.logger.info("Returning the SQL Server connection to the pool...")
+                self.catalog_query.close()
+                self.catalog_query = None
+                # Only drop the pooled connections when the connection settings actually changed
+                previous_connection_string = self.connection_string
+                self.get_connection_pool()
+                if previous_connection_string and previous_connection_string != self.connection_string:
+                    close_pool(previous_connection_string)
+            elif self.db_connected:
                 self.logger.info("Closing existing database connection...")
                 self.connection.close()
+            self.db_connected = False
             self.progressBar.setValue(50)
 
+            # The location may have changed, so show that location's replica while refetching
+            self.replica = CatalogReplica(self.config.get_replica_path())
+            self.replica_loaded = False
+            self.sync_token = None
+            self.replica_location = None
+            self.location_input.setEditText(self.config.get_location())
+            self.location_input.setVisible(not self.config.get_useSqlite())
+            self.snapshot = CatalogSnapshot(self.config.get_replica_path())
+            if not self.load_snapshot():
+                self.load_replica()
+
             self.logger.info("Reconnecting to the database...")
             self.connect_to_database()  # Reconnect to the database
             self.progressBar.setValue(74)
@@ -207,7 +779,8 @@ class BarcodeApp(QMainWindow):
 
             self.logger.info("Configuration reloaded and items refreshed successfully.")
             self.progressBar.setValue(100)
-            self.progressBar.setVisible(False)
+            if self.fetch_items_thread is None or not self.fetch_items_thread.isRunning():
+                self.progressBar.setVisible(False)
 
         except Exception as e:
             self.logger.error(f"Failed to reload configuration: {e}")
@@ -336,6 +909,29 @@ class BarcodeApp(QMainWindow):
 
             """)
         self.barcode_size.currentIndexChanged.connect(self.handle_barcode_size)
+        # Branch whose prices are shown; switching only re-prices the loaded catalog
+        self.location_input = QComboBox(self)
+        self.location_input.setEditable(True)
+        self.location_input.addItem(self.config.get_location())
+        self.location_input.setVisible(not self.config.get_useSqlite())
+        self.location_input.activated.connect(self.change_location)
+
+        # Facet filters, applied on top of the text search; filled once the catalog is indexed
+        self.uom_filter = QComboBox(self)
+        self.location_filter = QComboBox(self)
+        self.price_filter = QComboBox(self)
+        self.price_filter.addItem("Any price", None)
+        edges = FacetIndex.PRICE_EDGES
+        for edge in edges:
+            self.price_filter.addItem(f"Under RM {edge}", (None, edge))
+        self.price_filter.addItem(f"RM {edges[-1]} and over", (edges[-1], None))
+        for facet_filter in (self.uom_filter, self.location_filter, self.price_filter):
+            facet_filter.setCursor(Qt.PointingHandCursor)
+            facet_filter.setEnabled(False)
+            facet_filter.activated.connect(self.apply_facet_filters)
+        self.uom_filter.addItem("All UOMs", None)
+        self.location_filter.addItem("All locations", None)
+
         self.sqlite_switch = QCheckBox("Use SQLite")
         self.sqlite_switch.setChecked(self.config.get_useSqlite())  # default ON
         self.sqlite_switch.stateChanged.connect(self.toggle_database_mode)
@@ -348,6 +944,10 @@ class BarcodeApp(QMainWindow):
         # Add widgets to the search layout
         search_layout.addWidget(search_label)
         search_layout.addWidget(self.item_code_input)
+        search_layout.addWidget(self.location_input)
+        search_layout.addWidget(self.uom_filter)
+        search_layout.addWidget(self.location_filter)
+        search_layout.addWidget(self.price_filter)
         search_layout.addWidget(self.sqlite_switch)
         search_layout.addWidget(self.barcode_size )
         search_layout.addWidget(self.search_for_uom)
@@ -359,14 +959,18 @@ class BarcodeApp(QMainWindow):
         self.logger.debug("Search bar section initialized.")
 
         # === Item Table Section ===
-        self.item_table = QTableWidget(self)
-        self.item_table.setColumnCount(10)
-        self.item_table.setHorizontalHeaderLabels([
-            "*", "Item Code", "Description", "UOM" , "Unit Price", "Unit Cost",
-            "Barcode", "Location", "Price", "Copies"
-        ])
-        self.item_table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.item_table.setSelectionMode(QTableWidget.NoSelection)
+        # Rows are formatted on demand and paged in itemCount at a time as the table is scrolled
+        self.item_model = ItemTableModel(self, self.config.get_item_count(), self.display_rows, self.basket)
+        self.item_model.rows_loaded.connect(self.materialize_rows)
+        self.item_model.selection_changed.connect(self.update_selection_label)
+        self.item_table = QTableView(self)
+        self.item_table.setModel(self.item_model)
+        self.item_table.setSelectionBehavior(QTableView.SelectRows)
+        self.item_table.setSelectionMode(QTableView.NoSelection)
+        # Sorting runs with the search on the search worker, so the header only reports clicks
+        self.item_table.horizontalHeader().setSectionsClickable(True)
+        self.item_table.horizontalHeader().setSortIndicatorShown(False)
+        self.item_table.horizontalHeader().sectionClicked.connect(self.handle_sort_clicked)
 
         # Add table to the grid layout
         grid_layout.addWidget(self.item_table, 1, 0, 1, 3)
@@ -415,12 +1019,49 @@ class BarcodeApp(QMainWindow):
         self.print_button.setCursor(Qt.PointingHandCursor)
         self.reload_button.setCursor(Qt.PointingHandCursor)
         self.print_button.clicked.connect(self.print_barcode)
-        self.reload_button.clicked.connect(self.handle_config_change)
+
+        # Prints every row of the current results, however many, as a background job
+        self.print_all_button = QPushButton('Print All Results', self)
+        self.print_all_button.setCursor(Qt.PointingHandCursor)
+        self.print_all_button.clicked.connect(self.print_all_results)
+        self.print_progress = QProgressBar(self)
+        self.print_progress.setVisible(False)
+        self.stop_print_button = QPushButton('Stop Printing', self)
+        self.stop_print_button.setCursor(Qt.PointingHandCursor)
+        self.stop_print_button.setVisible(False)
+        self.stop_print_button.clicked.connect(self.stop_print_job)
+        self.reload_button.clicked.connect(self.reload_items)
+
+        # Next page of results, only used when searching the database directly
+        self.more_button = QPushButton('More Results', self)
+        self.more_button.setCursor(Qt.PointingHandCursor)
+        self.more_button.setVisible(False)
+        self.more_button.clicked.connect(self.show_more_results)
+
+        # Picked items stay picked across searches until printed or cleared
+        self.selection_label = QLabel('', self)
+        self.clear_selection_button = QPushButton('Clear Selection', self)
+        self.clear_selection_button.setCursor(Qt.PointingHandCursor)
+        self.clear_selection_button.clicked.connect(self.clear_selection)
+        self.update_selection_label()
+
+        # Cancel button is only shown while items are streaming in
+        self.cancel_button = QPushButton('Cancel', self)
+        self.cancel_button.setCursor(Qt.PointingHandCursor)
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel_fetch_items)
 
         # Add the print and reload buttons to the layout, centered
         print_layout.addStretch(1)
         print_layout.addWidget(self.progressBar)
+        print_layout.addWidget(self.cancel_button)
+        print_layout.addWidget(self.more_button)
         print_layout.addWidget(self.reload_button)
+        print_layout.addWidget(self.print_progress)
+        print_layout.addWidget(self.stop_print_button)
+        print_layout.addWidget(self.selection_label)
+        print_layout.addWidget(self.clear_selection_button)
+        print_layout.addWidget(self.print_all_button)
         print_layout.addWidget(self.print_button)
 
         # Create a new layout for the "Update Database" button to align it to the right
@@ -507,7 +1148,7 @@ class BarcodeApp(QMainWindow):
             stylesheet = """
             QLabel { font-size: 20px; font-weight: bold; }
             QLineEdit { font-size: 18px; padding: 8px; border: 2px solid rgb(53, 132, 228);border-radius: 10px; }
-            QTableWidget { font-size: 16px; padding: 4px; border: 1px solid black; border-radius: 12px; }
+            QTableView { font-size: 16px; padding: 4px; border: 1px solid black; border-radius: 12px; }
             QPushButton { padding: 10px 20px; font-size: 20px; margin: 10px; }
             QPushButton:hover { background-color: rgb(0, 106, 255); }
             QPushButton:pressed { background-color: #000099; }
@@ -525,28 +1166,196 @@ class BarcodeApp(QMainWindow):
             QMessageBox.critical(self, 'Stylesheet Error', f"Failed to apply stylesheet: {e}")
 
 
+    def get_connection_pool(self):
+        """Return the shared SQL Server connection pool for the current configuration."""
+        self.connection_string = build_connection_string(
+            self.config.get_server(),
+            self.config.get_database(),
+            self.config.get_username(),
+            self.config.get_password(),
+            self.config.get_trusted_connection(),
+        )
+        return get_pool(self.connection_string, self.config.get_pool_max_size(), self.config.get_pool_idle_timeout())
+
+    def load_replica(self):
+        """
+        Load the catalog for the configured location from the local replica.
+
+        Returns True when replica items were displayed. Only used in SQL Server mode.
+        """
+        if self.config.get_useSqlite() or not self.config.get_use_replica():
+            return False
+
+        items = self.replica.load(self.config.get_location())
+        if not items:
+            return False
+
+        self.replica_loaded = True
+        self.sync_token = self.replica.sync_token(self.config.get_location())
+        self.catalog_location = self.config.get_location()
+        self.replica_location = self.catalog_location
+        self.catalog_source = self.catalog_source_key()
+        catalog = CatalogStore()
+        catalog.extend(items)
+        catalog.sort()  # Replica rows are stored sorted by barcode, so this is a single pass
+        self.install_catalog(catalog)
+        self.display_catalog()
+        self.statusBar().showMessage(f"Showing {len(items)} items from the local replica, checking SQL Server...")
+        return True
+
+    def catalog_source_key(self, location=None):
+        """Identify the source of a catalog, so a snapshot of another database, file or location is not reused."""
+        if self.config.get_useSqlite():
+            path = self.config.get_sqlPath()
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            return f"sqlite:{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+        location = location or self.config.get_location()
+        return f"sqlserver:{self.config.get_server()}/{self.config.get_database()}:{location}"
+
+    def load_snapshot(self):
+        """
+        Map the catalog snapshot written on the last exit.
+
+        Returns True when its items were displayed. Rows are read from the
+        mapping as they are needed, so this takes milliseconds at any size.
+        """
+        if not self.config.get_use_snapshot():
+            return False
+        key = self.catalog_source_key()
+        catalog = self.snapshot.open(key) if key is not None else None
+        if catalog is None:
+            return False
+
+        self.replica_loaded = True  # Searching and error handling treat it like the replica
+        self.catalog_source = key
+        self.install_catalog(catalog)
+        self.sync_token = catalog.sync_token
+        if self.config.get_useSqlite():
+            self.snapshot_current = True
+        else:
+            location = self.config.get_location()
+            self.catalog_location = location
+            # Deltas may only patch the replica if it is at the same sync token as the snapshot
+            replica_current = self.config.get_use_replica() and self.replica.sync_token(location) == catalog.sync_token
+            self.replica_location = location if replica_current else None
+        self.display_catalog()
+        self.statusBar().showMessage(f"Showing {len(catalog)} items from the catalog snapshot.", 5000)
+        return True
+
+    def save_snapshot(self):
+        """Write the catalog to the snapshot for the next start. A MappedCatalog is already there unchanged."""
+        if not self.config.get_use_snapshot() or self.catalog_source is None:
+            return
+        if not isinstance(self.catalog, CatalogStore) or not len(self.catalog):
+            return
+        self.snapshot.save(self.catalog, self.catalog_source, self.sync_token)
+
+    def ensure_mutable_catalog(self, store=None):
+        """
+        Swap a MappedCatalog for a CatalogStore with the same row ids before changing it.
+
+        store is a copy a worker already made; without one the copy is made here.
+        """
+        if not isinstance(self.catalog, MappedCatalog):
+            return
+        mapped = self.catalog
+        store = store if store is not None else mapped.to_store()
+        with self.search_worker.lock:  # Same row ids, so a search may go on with either
+            self.catalog = store
+        if self.displayed_catalog is mapped:
+            self.displayed_catalog = self.catalog
+            self.item_model.replace_catalog(self.catalog)
+        self.basket.replace_catalog(mapped, self.catalog)
+        self.close_mapped_catalog(mapped)
+
+    def catalog_readers(self, catalog):
+        """Return the running worker threads that read catalog without the search lock."""
+        threads = (
+            self.search_index_thread, self.sharded_search_thread, self.print_job_thread,
+            self.delta_refresh_thread, self.location_prices_thread,
+        )
+        return [thread for thread in threads if thread is not None and thread.catalog is catalog and not thread.isFinished()]
+
+    def close_mapped_catalog(self, catalog):
+        """
+        Unmap a replaced MappedCatalog so the snapshot file can be replaced on exit.
+
+        Threads still reading it keep it mapped until they finish, as reading
+        an unmapped catalog raises in the middle of their work.
+        """
+        if not isinstance(catalog, MappedCatalog):
+            return
+        readers = self.catalog_readers(catalog)
+        if readers:
+            if catalog not in self.retired_catalogs:
+                self.retired_catalogs.append(catalog)
+            for thread in readers:
+                thread.finished.connect(self.close_retired_catalogs)
+            return
+        try:
+            with self.search_worker.lock:  # Not while a search reads it
+                catalog.close()
+        except BufferError as e:
+            self.logger.warning(f"Catalog snapshot still in use, leaving it mapped: {e}")
+
+    def close_retired_catalogs(self):
+        thread = self.sender()
+        if thread is not None:
+            thread.wait()  # It emitted finished as its last step
+        retired, self.retired_catalogs = self.retired_catalogs, []
+        for catalog in retired:
+            self.close_mapped_catalog(catalog)
+
+    def get_plu_index(self):
+        """Return the FTS5 name index of the SQLite file, or None when it is not used."""
+        if not self.config.get_useSqlite() or not self.config.get_use_full_text_search():
+            return None
+        db_path = self.config.get_sqlPath()
+        if self.plu_index is None or self.plu_index.db_path != os.path.abspath(db_path):
+            self.plu_index = PluSearchIndex(db_path, self.config.get_replica_path())
+        return self.plu_index
+
+    def full_text_search(self, catalog, search_text, index):
+        """
+        Search SQLite names through the FTS5 index from get_plu_index(), best match first.
+
+        Returns None when the index cannot be used and the names have to be scanned.
+        """
+        barcodes = index.search(search_text) if index is not None else None
+        if barcodes is None:
+            return None
+
+        barcode_index = self.prefix_index(catalog, 'barcode')
+        filtered_items = []
+        seen = set()
+        for barcode in barcodes:
+            key = str(barcode).lower()
+            if key not in seen:
+                seen.add(key)
+                filtered_items.extend(barcode_index.exact(key))
+        return filtered_items
+
+    def get_catalog_query(self):
+        """Return the shared CatalogQuery, creating one that checks out its connection lazily when offline."""
+        if self.catalog_query is None:
+            self.catalog_query = CatalogQuery(self.get_connection_pool())
+        return self.catalog_query
+
+    def handle_connection_opened(self, connection):
+        self.connection = connection
+        self.db_connected = True
+        self.logger.info("Background fetch connected to SQL Server.")
+
     def connect_to_database(self):
         if not self.config.get_useSqlite():
             try:
                 self.logger.info("Attempting to connect to SQL Server...")
 
-                if self.config.get_trusted_connection():
-                    self.connection = pyodbc.connect(
-                        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                        f'SERVER={self.config.get_server()};'
-                        f'DATABASE={self.config.get_database()};'
-                        f'UID={self.config.get_username()};'
-                        f'PWD={self.config.get_password()};'
-                        'Trusted_Connection=yes;'
-                    )
-                else:
-                    self.connection = pyodbc.connect(
-                        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                        f'SERVER={self.config.get_server()};'
-                        f'DATABASE={self.config.get_database()};'
-                        f'UID={self.config.get_username()};'
-                        f'PWD={self.config.get_password()}'
-                    )
+                self.catalog_query = CatalogQuery(self.get_connection_pool())
+                self.connection = self.catalog_query.connection  # Checked out of the pool
 
                 if self.connection:
                     self.db_connected = True
@@ -569,63 +1378,530 @@ class BarcodeApp(QMainWindow):
                 print(f"Error connecting to SQLite database: {e}")
                 self.db_connected = False
 
-    def replace_placeholders(self, template, **kwargs):
-        def replace(match):
-            key = match.group(1)
-            if key not in kwargs:
-                self.logger.warning(f"Missing placeholder for: {key}")
-                return f"{{{{{key}}}}}"  # Or raise an exception if needed
-            return str(kwargs[key])
-        return re.sub(r'{{(.*?)}}', replace, template)
-
     def start_fetch_items(self):
         print("[DEBUG] start_fetch_items() called")
 
-        if not self.db_connected:
+        if not self.db_connected and not self.replica_loaded:
             self.logger.error('Database is not connected. Items will not be shown.')
             QMessageBox.critical(self, 'Database Error', 'Database is not connected. Items will not be shown.')
             return
 
         self.logger.info(f"Fetching items for location: {self.config.get_location()}")
 
+        # Only one fetch may stream at a time; stop the previous one before replacing it
+        self.cancel_fetch_items()
+        if self.fetch_items_thread is not None:
+            self.fetch_items_thread.wait()
+
+        self.pushdown = None
+        self.more_button.setVisible(False)
+        self.fetch_source = self.catalog_source_key()  # Taken before reading, so a file changed meanwhile is refetched
+        batch_size = self.config.get_fetch_batch_size()
+        threshold = self.config.get_pushdown_threshold()
         if self.config.get_useSqlite():
             db_path = self.config.get_sqlPath()
-            self.fetch_items_thread = FetchItemsThread(db_path, self.config.get_location(), True)
+            self.fetch_items_thread = FetchItemsThread(
+                db_path, self.config.get_location(), True, batch_size, pushdown_threshold=threshold,
+                search_index=self.get_plu_index()
+            )
         else:
-            self.fetch_items_thread = FetchItemsThread(self.connection, self.config.get_location(), False)
-
+            # Without a live connection the worker connects itself, keeping the replica usable meanwhile
+            replica = self.replica if self.config.get_use_replica() else None
+            self.fetch_items_thread = FetchItemsThread(
+                self.get_catalog_query(), self.config.get_location(), False, batch_size, replica, threshold
+            )
+
+        # Once replica items are on screen, streamed batches must not replace them with a partial preview
+        self.first_batch_shown = self.catalog is not None and len(self.catalog) > 0
+        self.fetch_items_thread.items_batch.connect(self.handle_items_batch)
+        self.fetch_items_thread.progress.connect(self.handle_fetch_progress)
         self.fetch_items_thread.items_fetched.connect(self.handle_items_fetched)
+        self.fetch_items_thread.fetch_cancelled.connect(self.handle_fetch_cancelled)
+        self.fetch_items_thread.connection_opened.connect(self.handle_connection_opened)
+        self.fetch_items_thread.sync_token_ready.connect(self.handle_sync_token)
+        self.fetch_items_thread.pushdown_selected.connect(self.handle_pushdown_selected)
         self.fetch_items_thread.error_occurred.connect(self.handle_fetch_error)
+        self.fetch_items_thread.finished.connect(self.handle_fetch_finished)
+
+        self.progressBar.setRange(0, 0)  # Busy indicator until the first progress report
+        self.progressBar.setVisible(True)
+        self.cancel_button.setVisible(True)
         self.fetch_items_thread.start()
 
-    
-    def handle_fetch_error(self, message):
-        print(f"[ERROR] {message}")
-        QMessageBox.critical(self, "Fetch Error", message)
+    def reload_items(self):
+        """Reload button: apply only the changes when possible, otherwise reconnect and refetch everything."""
+        if not self.refresh_items(full_fetch_fallback=True):
+            self.handle_config_change()
 
+    def refresh_items(self, full_fetch_fallback=False):
+        """
+        Start an incremental refresh of the catalog.
 
+        Returns False when no delta can be attempted (SQLite mode, no sync token
+        yet, or a fetch already running). With full_fetch_fallback, a full fetch
+        is started if the server later reports that a delta is not possible.
+        """
+        if self.config.get_useSqlite() or self.sync_token is None or self.catalog is None:
+            return False
+        if self.fetch_items_thread is not None and self.fetch_items_thread.isRunning():
+            return False
+        if self.delta_refresh_thread is not None and self.delta_refresh_thread.isRunning():
+            return True
+
+        self.logger.info(f"Starting delta refresh from sync token {self.sync_token}")
+        self.delta_fallback = full_fetch_fallback
+        # The replica of a location switched to in memory may be older than this sync token
+        use_replica = self.config.get_use_replica() and self.replica_location == self.catalog_location
+        replica = self.replica if use_replica else None
+        self.delta_refresh_thread = DeltaRefreshThread(
+            self.get_catalog_query(), self.catalog_location, self.sync_token, replica, self.catalog
+        )
+        self.delta_refresh_thread.delta_fetched.connect(self.handle_delta_fetched)
+        self.delta_refresh_thread.delta_unavailable.connect(self.handle_delta_unavailable)
+        self.delta_refresh_thread.full_fetch_needed.connect(self.handle_full_fetch_needed)
+        self.delta_refresh_thread.connection_opened.connect(self.handle_connection_opened)
+        self.delta_refresh_thread.error_occurred.connect(self.handle_delta_error)
+        self.delta_refresh_thread.start()
+        return True
+
+    def handle_sync_token(self, sync_token):
+        self.sync_token = sync_token
+        self.logger.info(f"Catalog sync token set to {sync_token}")
+
+    def handle_delta_fetched(self, sync_token, changed_item_codes, rows, store=None):
+        thread = self.delta_refresh_thread
+        if changed_item_codes and thread.location != self.catalog_location:
+            # Priced for the location switched away from while it ran; read the changes again at this one
+            self.logger.info(f"Delta refresh was for location {thread.location}, refreshing again for {self.catalog_location}.")
+            thread.wait()  # It emitted its result as its last step
+            self.refresh_items()
+            return
+        self.sync_token = sync_token
+        if not changed_item_codes:
+            self.logger.info("Delta refresh: no changes since the last sync.")
+            return
 
-    def handle_items_fetched(self, items):
-        print("[DEBUG] handle_items_fetched called")
+        self.ensure_mutable_catalog(store)
+        self.apply_item_delta(changed_item_codes, rows)
+        self.location_prices.clear()  # The price plan may be among the changes
+        self.logger.info(f"Delta refresh: updated {len(changed_item_codes)} item codes ({len(rows)} rows).")
+        self.statusBar().showMessage(f"Updated {len(changed_item_codes)} changed items.", 5000)
+        # Changed rows got new row ids, and the old ones keep the old values, so the rows shown are searched again;
+        # until the results come, the rows on screen are formatted afresh
+        self.item_model.refresh()
+        self.submit_search(self.search_mode, self.search_text)
+
+    def handle_delta_unavailable(self, reason):
+        self.logger.warning(f"Delta refresh not possible: {reason}")
+        self.sync_token = None  # Stop the timer from retrying until a full fetch provides a new token
+        if self.delta_fallback:
+            self.start_fetch_items()
+
+    def handle_full_fetch_needed(self, reason):
+        self.logger.warning(f"Delta refresh not possible, fetching the whole catalog: {reason}")
+        self.sync_token = None
+        self.start_fetch_items()
+
+    def handle_delta_error(self, message):
+        # Background refreshes must not pop up a dialog every interval while the server is down
+        self.logger.error(message)
+        self.statusBar().showMessage("Could not refresh changed items from SQL Server.", 5000)
+
+    def apply_item_delta(self, changed_item_codes, rows):
+        """Patch the in-memory catalog, and its search indexes, with the rows of the changed items."""
+        with self.search_worker.lock:  # Not while a search reads them
+            # The catalog patches its own sort orders, which the prefix indexes read
+            removed, added = self.catalog.replace_item_codes(changed_item_codes, [tuple(row) for row in rows])
+            if self.search_indexes is not None:
+                for index in self.search_indexes.values():
+                    index.update(self.catalog, removed, added)
+            elif self.search_index_thread is not None and self.search_index_thread.isRunning():
+                self.search_index_pending.append((removed, added))
+            if self.fuzzy_indexes is not None:
+                for index in self.fuzzy_indexes.values():
+                    index.update(self.catalog, removed, added)
+            elif self.search_index_thread is not None and self.search_index_thread.isRunning():
+                self.fuzzy_pending.append((removed, added))
+            if removed or added:
+                self.sharded_search_stale = True  # Its shared memory holds the old rows
+        if removed or added:
+            dropped = self.basket.update(self.catalog, removed, added)  # Changed items get new row ids
+            if dropped:
+                self.logger.warning(f"{dropped} selected items were removed from the catalog and unselected.")
+            self.update_selection_label()
+            self.start_sharded_search()
+            self.update_facet_filters()  # New rows may bring new UOMs
+
+    def install_catalog(self, catalog):
+        """
+        Make catalog, or None in pushdown mode, the one searched, shown and printed from.
+
+        The running search is cancelled rather than waited for, and the
+        catalog and its indexes are swapped under the search lock, so a search
+        never sees a catalog with another catalog's indexes.
+        """
+        if self.search_index_thread is not None and self.search_index_thread.isRunning():
+            self.search_index_thread.requestInterruption()
+            self.search_index_thread.wait()
+        self.search_worker.cancel()
+        with self.search_worker.lock:
+            self.catalog = catalog
+            self.catalog_generation += 1
+            self.search_indexes = None
+            self.fuzzy_indexes = None
+            self.sort_indexes = {}  # Let go of the old catalog
+            self.sharded_search_stale = True
+        if catalog is not None:
+            self.start_search_indexes()
+
+    def start_search_indexes(self):
+        """Build the text search indexes of a newly installed catalog in the background."""
+        self.search_index_pending = []
+        dropped = self.basket.rebase(self.catalog)  # Row ids of the old catalog mean nothing in this one
+        if dropped:
+            self.logger.warning(f"{dropped} selected items are no longer in the catalog and were unselected.")
+        self.update_selection_label()
+        self.facet_prices_stale = False
+        self.update_facet_filters()
+        self.fuzzy_pending = []
+        self.search_index_thread = SearchIndexThread(self.catalog, self.catalog_generation)
+        self.search_index_thread.indexes_ready.connect(self.handle_search_indexes_ready)
+        self.search_index_thread.fuzzy_ready.connect(self.handle_fuzzy_indexes_ready)
+        self.search_index_thread.start()
+        self.start_sharded_search()
+
+    def start_sharded_search(self):
+        """
+        Bring the multi-process search up to date with the current catalog when it has at least
+        shardedSearchThreshold rows: the keys are copied in the background, the running search processes are kept.
+        """
+        threshold = self.config.get_sharded_search_threshold()
+        if self.catalog is None or threshold <= 0 or len(self.catalog) < threshold:
+            if self.sharded_search is not None:
+                with self.search_worker.lock:  # Not while a search uses it
+                    self.sharded_search.close()
+                self.sharded_search = None
+            return
+        if self.sharded_search_thread is not None and self.sharded_search_thread.isRunning():
+            self.sharded_search_pending = True  # Copied again when the running copy finishes
+            return
+        self.sharded_search_pending = False
+        columns = ["description", get_adapter(self.catalog.source).code_column]
+        self.sharded_search_thread = ShardedSearchThread(
+            self.catalog, self.catalog_generation, columns, self.sharded_search
+        )
+        self.sharded_search_thread.engine_ready.connect(self.handle_sharded_search_ready)
+        self.sharded_search_thread.keys_ready.connect(self.handle_sharded_keys_ready)
+        self.sharded_search_thread.error_occurred.connect(self.logger.error)
+        self.sharded_search_thread.start()
+
+    def handle_sharded_search_ready(self, generation, engine):
+        self.sharded_search = engine
+        if generation != self.catalog_generation or self.sharded_search_pending:
+            self.start_sharded_search()  # Built from rows that have since changed; its processes are reused
+            return
+        self.sharded_search_stale = False
+        self.logger.info(f"Sharded search ready over {engine.rows} rows.")
+
+    def handle_sharded_keys_ready(self, generation, keys):
+        if self.sharded_search is None:
+            keys.close()  # The catalog has become too small for it
+            return
+        if generation != self.catalog_generation or self.sharded_search_pending:
+            keys.close()
+            self.start_sharded_search()
+            return
+        with self.search_worker.lock:  # Not while a search uses the old keys
+            self.sharded_search.swap(keys)
+            self.sharded_search_stale = False
+
+    def close_sharded_search(self):
+        if self.sharded_search_thread is not None:
+            self.sharded_search_thread.wait()
+            engine = self.sharded_search_thread.engine
+            if engine is not None and engine is not self.sharded_search:
+                engine.close()
+            keys = self.sharded_search_thread.keys
+            if keys is not None and (self.sharded_search is None or keys is not self.sharded_search.keys):
+                keys.close()
+        if self.sharded_search is not None:
+            self.sharded_search.close()
+            self.sharded_search = None
+
+    def handle_search_indexes_ready(self, generation, indexes):
+        if generation != self.catalog_generation:
+            return  # Built for a catalog that has since been replaced
+        # Row ids survive copying a MappedCatalog into a CatalogStore, so the indexes stay valid
+        for removed, added in self.search_index_pending:
+            for index in indexes.values():
+                index.update(self.catalog, removed, added)
+        self.search_index_pending = []
+        if self.facet_prices_stale:
+            indexes["facets"].refresh_prices(self.catalog)
+            self.facet_prices_stale = False
+        self.search_indexes = indexes
+        self.update_facet_filters()
+        self.logger.info("Search indexes ready.")
+
+    def handle_fuzzy_indexes_ready(self, generation, indexes):
+        if generation != self.catalog_generation:
+            return
+        for removed, added in self.fuzzy_pending:
+            for index in indexes.values():
+                index.update(self.catalog, removed, added)
+        self.fuzzy_pending = []
+        self.fuzzy_indexes = indexes
+        self.logger.info("Fuzzy search indexes ready.")
+
+    def fuzzy_search(self, catalog, indexes, fuzzy_indexes, keywords, isUOM, limit=100, budget=0.15):
+        """
+        Return up to limit row ids matching every keyword within a small edit
+        distance, closest first, or None before the fuzzy indexes are built.
+
+        A keyword matches a row exactly (distance 0) as in the normal search,
+        or through the closest terms of the fuzzy index; a row scores the sum
+        of its keywords' distances. Lookups stop once budget seconds are spent.
+        """
+        if fuzzy_indexes is None or indexes is None or not keywords:
+            return None
+        deadline = time.perf_counter() + budget
+        if isUOM:
+            index = fuzzy_indexes["code_fuzzy"]
+            code_index = self.prefix_index(catalog, index.column)
+            exact_rows = lambda keyword: indexes["code_ngrams"].search(catalog, [keyword]) or ()
+            term_rows = code_index.exact
+        else:
+            index = fuzzy_indexes["description_fuzzy"]
+            tokens = indexes["description_tokens"]
+            exact_rows = lambda keyword: tokens.search([keyword])
+            term_rows = lambda term: [row_id for row_id in tokens.postings.get(term, ()) if row_id not in tokens.dead]
+
+        matches = []
+        for keyword in set(keywords):
+            distances = dict.fromkeys(exact_rows(keyword), 0)
+            for distance, term in index.lookup(keyword, deadline=deadline):
+                for row_id in term_rows(term):
+                    if distances.get(row_id, distance) >= distance:
+                        distances[row_id] = distance
+            if not distances:
+                return []
+            matches.append(distances)
+
+        matches.sort(key=len)
+        scores = matches[0]
+        for distances in matches[1:]:
+            scores = {row_id: score + distances[row_id] for row_id, score in scores.items() if row_id in distances}
+        return heapq.nsmallest(limit, scores, key=lambda row_id: (scores[row_id], catalog.barcode_key(row_id)))
+
+    def indexed_search(self, catalog, indexes, keywords, ngram_index, token_index=None):
+        """
+        Return the row ids containing every keyword in barcode order, using the
+        n-gram index and then the token index, or None before they are built.
+        """
+        if indexes is None:
+            return None
+        row_ids = indexes[ngram_index].search(catalog, keywords)
+        if row_ids is None and token_index is not None:
+            row_ids = indexes[token_index].search(keywords)
+        if row_ids is None:
+            return None
+        return sorted(row_ids, key=catalog.barcode_key)
+
+    def prefix_index(self, catalog, column):
+        """Return the PrefixIndex of a catalog column, built on first use for each catalog."""
+        if self.indexed_catalog is not catalog:
+            self.prefix_indexes = {}
+            self.indexed_catalog = catalog
+        index = self.prefix_indexes.get(column)
+        if index is None:
+            index = PrefixIndex(catalog, column)
+            self.prefix_indexes[column] = index
+        return index
+
+    def handle_pushdown_selected(self, total):
+        """Switch searching to bounded database queries because the catalog is too large to load."""
+        self.logger.info(f"Catalog has {total} rows, using pushdown search instead of loading it.")
+        if self.config.get_useSqlite():
+            self.pushdown = SqlitePushdownSearch(self.config.get_sqlPath())
+        else:
+            self.pushdown = SqlServerPushdownSearch(self.get_catalog_query(), self.config.get_location())
+        self.basket.detach()  # Keep the picked rows without the catalog they came from
+        self.install_catalog(None)
+        self.sort_columns = ()  # Pages come sorted by the database
+        self.sort_descending = False
+        self.statusBar().showMessage(f"Large catalog ({total} items): searching the database directly.")
+        self.start_pushdown_search('all', '')
+
+    def start_pushdown_search(self, mode, text, after=None):
+        """Fetch one page of pushdown results; only one search runs at a time, the latest request waits."""
+        if self.pushdown_thread is not None and self.pushdown_thread.isRunning():
+            self.pending_pushdown = (mode, text, after)
+            return
 
-        print(f"{len(items)} items fetched from database")
-        for i, item in enumerate(items[:5]):
-            print(f"Item {i + 1}: {item}")
+        self.pushdown_request = (mode, text, None)
+        self.pushdown_thread = PushdownSearchThread(self.pushdown, mode, text, self.config.get_item_count(), after)
+        self.pushdown_thread.results_ready.connect(self.handle_pushdown_results)
+        self.pushdown_thread.error_occurred.connect(self.handle_fetch_error)
+        self.pushdown_thread.finished.connect(self.handle_pushdown_finished)
+        self.pushdown_thread.start()
+
+    def handle_pushdown_results(self, page, next_key):
+        mode, text, _ = self.pushdown_request
+        self.pushdown_request = (mode, text, next_key)
+        self.more_button.setVisible(next_key is not None)
+        self.display_items(page.ids(), page)
+
+    def handle_pushdown_finished(self):
+        if self.pending_pushdown is not None:
+            request, self.pending_pushdown = self.pending_pushdown, None
+            self.start_pushdown_search(*request)
+
+    def show_more_results(self):
+        """Load the next keyset page of the current pushdown search."""
+        if self.pushdown is None or self.pushdown_request is None:
+            return
+        mode, text, next_key = self.pushdown_request
+        if next_key is not None:
+            self.start_pushdown_search(mode, text, next_key)
 
-        if items:
-            print(f"Fetched {len(items)} items")
-            self.logger.info(f"Fetched {len(items)} items.")
+    def change_location(self):
+        location = self.location_input.currentText().strip()
+        if location and location != self.config.get_location():
+            self.config.set_location(location)
 
-            self.items = items
+    def switch_location(self, location):
+        """
+        Show another location's prices without refetching the catalog.
 
-            if self.config.get_useSqlite():
-                # SQLite: barCode is at index 0
-                self.all_items = sorted(self.items, key=lambda x: str(x[0]).lower())
+        Returns False when a full reload is needed instead, e.g. while the
+        catalog is still being fetched.
+        """
+        if self.config.get_useSqlite():
+            return True  # Tbl_Plu has no locations
+        if self.location_input.currentText() != location:
+            self.location_input.setEditText(location)
+        if self.pushdown is not None:
+            self.pushdown.location = location
+            self.start_pushdown_search('all', '')
+            return True
+        if self.catalog is None or (self.fetch_items_thread is not None and self.fetch_items_thread.isRunning()):
+            return False
+
+        prices = self.location_prices.get(location)
+        if prices is not None:
+            self.apply_location_prices(location, prices)
+        else:
+            self.statusBar().showMessage(f"Loading prices for location {location}...")
+            self.load_location_prices(location)
+        return True
+
+    def load_location_prices(self, location):
+        """Load a location's price plan in the background; the last requested location is applied."""
+        if self.location_prices_thread is not None and self.location_prices_thread.isRunning():
+            self.location_prices_thread.wait()
+        self.location_prices_thread = LocationPricesThread(
+            self.location_prices, self.get_connection_pool(), location, self.catalog
+        )
+        self.location_prices_thread.prices_loaded.connect(self.handle_location_prices_loaded)
+        self.location_prices_thread.locations_loaded.connect(self.handle_locations_loaded)
+        self.location_prices_thread.error_occurred.connect(self.handle_delta_error)
+        self.location_prices_thread.start()
+
+    def handle_location_prices_loaded(self, location, prices, store):
+        # Ignore a location the user already switched away from
+        if location == self.config.get_location() and self.catalog is not None:
+            self.ensure_mutable_catalog(store)
+            self.apply_location_prices(location, prices)
+
+    def handle_locations_loaded(self, locations):
+        current = self.location_input.currentText()
+        self.location_input.clear()
+        self.location_input.addItems(locations)
+        self.location_input.setEditText(current)
+
+    def apply_location_prices(self, location, prices):
+        """Join a location's price overlay onto the catalog and refresh the rows on screen."""
+        self.ensure_mutable_catalog()
+        with self.search_worker.lock:
+            self.catalog.apply_location_prices(location, prices)
+            if self.search_indexes is not None:
+                self.search_indexes["facets"].refresh_prices(self.catalog)
             else:
-                # SQL Server: barCode is at index 5
-                self.all_items = sorted(self.items, key=lambda x: str(x[5]).lower())
+                self.facet_prices_stale = True
+        self.update_facet_filters()
+        self.catalog_location = location
+        self.catalog_source = self.catalog_source_key(location)
+        self.logger.info(f"Switched catalog prices to location {location} in memory.")
+        self.statusBar().showMessage(f"Showing prices for location {location}.", 5000)
+        if self.displayed_catalog is self.catalog:
+            self.item_model.refresh()  # Cells read the new prices as they repaint
+
+    def cancel_fetch_items(self):
+        """Cancel the running catalog fetch, if any."""
+        if self.fetch_items_thread is not None and self.fetch_items_thread.isRunning():
+            self.logger.info("Cancelling running item fetch...")
+            self.fetch_items_thread.cancel()
+
+    def handle_items_batch(self, catalog, row_ids):
+        # Show the first batch straight away so the window is not blank while the rest streams in
+        if not self.first_batch_shown and row_ids:
+            self.first_batch_shown = True
+            self.logger.info(f"First batch of {len(row_ids)} items received, displaying preview.")
+            self.display_items(row_ids, catalog)
+
+    def handle_fetch_progress(self, fetched, total):
+        self.progressBar.setRange(0, total)
+        self.progressBar.setValue(fetched)
+        self.progressBar.setFormat(f"{fetched} / {total} items")
+
+    def handle_fetch_cancelled(self):
+        self.logger.warning("Item fetch was cancelled before completion.")
+
+    def handle_fetch_finished(self):
+        self.progressBar.setRange(0, 100)
+        self.progressBar.resetFormat()
+        self.progressBar.setVisible(False)
+        self.cancel_button.setVisible(False)
+
+    def handle_fetch_error(self, message):
+        print(f"[ERROR] {message}")
+        if self.replica_loaded:
+            # Keep working from the replica instead of interrupting the user
+            self.logger.warning(f"Revalidation failed, continuing with the local replica: {message}")
+            self.statusBar().showMessage("SQL Server unavailable, showing items from the local replica.")
+            return
+        QMessageBox.critical(self, "Fetch Error", message)
+
+
 
-            self.display_items(self.all_items)
+    def handle_items_fetched(self, catalog):
+        print("[DEBUG] handle_items_fetched called")
+
+        print(f"{len(catalog)} items fetched from database")
+        for i, row_id in enumerate(catalog.ids()[:5]):
+            print(f"Item {i + 1}: {catalog.record(row_id)}")
+
+        if len(catalog):
+            print(f"Fetched {len(catalog)} items")
+            self.logger.info(f"Fetched {len(catalog)} items.")
+
+            # The catalog arrives already sorted by barcode from FetchItemsThread
+            previous_catalog = self.catalog
+            self.catalog_source = self.fetch_source
+            self.install_catalog(catalog)
+            self.catalog_location = self.fetch_items_thread.location
+            self.location_prices.clear()
+            if get_adapter(catalog.source).has_locations:
+                if self.config.get_use_replica():
+                    self.replica_location = self.catalog_location  # Saved by the fetch worker
+                if self.location_prices.locations is None:
+                    self.load_location_prices(None)  # Fill the location list
+            if self.replica_loaded:
+                self.statusBar().showMessage("Catalog revalidated against SQL Server.", 5000)
+
+            self.display_catalog()
+            if previous_catalog is not catalog:
+                self.close_mapped_catalog(previous_catalog)
             self.logger.info("Items successfully displayed.")
         else:
             self.logger.warning("No items fetched from the database.")
@@ -654,153 +1930,140 @@ class BarcodeApp(QMainWindow):
             QMessageBox.critical(self, 'Error', f"Failed to open Dashboard window: {e}")
 
     def closeEvent(self, event):
-        """Override the close event to save column widths."""
+        """Override the close event to stop the workers and save column widths and the catalog snapshot."""
         self.save_column_widths()
+        if self.fetch_items_thread is not None:
+            self.fetch_items_thread.cancel()  # Stops after the batch being read
+        # The print job ends after the batch being sent; the others after the statement or step they are in
+        threads = [
+            thread for thread in (
+                self.fetch_items_thread, self.delta_refresh_thread, self.location_prices_thread,
+                self.pushdown_thread, self.search_index_thread, self.print_job_thread,
+            )
+            if thread is not None
+        ]
+        for thread in threads:
+            thread.requestInterruption()
+        for thread in threads:
+            thread.wait()
+        self.display_rows_worker.stop()
+        self.search_worker.stop()
+        self.close_sharded_search()
+        self.close_retired_catalogs()  # Every reader has finished
+        self.save_snapshot()
         super().closeEvent(event)
 
     def save_column_widths(self):
         """Save column widths to QSettings."""
-        for i in range(self.item_table.columnCount()):
+        for i in range(self.item_model.columnCount()):
             self.settings.setValue(f"column_width_{i}", self.item_table.columnWidth(i))
         print("Column widths saved.")
 
     def restore_column_widths(self):
         """Restore column widths from QSettings."""
-        for i in range(self.item_table.columnCount()):
+        for i in range(self.item_model.columnCount()):
             width = self.settings.value(f"column_width_{i}", type=int)
             if width:
                 self.item_table.setColumnWidth(i, width)
         print("Column widths restored.")
     
-    def display_items(self, items):
-        try:
-            self.logger.info(f"Displaying {len(items[:100])} items.")
-            self.item_table.setRowCount(len(items[:100]))
-
-            barcode_config = Configurations.BarcodeConfig()
-
-            for row_number, item in enumerate(items[:100]):
-                checkbox_item = QTableWidgetItem()
-                checkbox_item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
-                checkbox_item.setCheckState(Qt.Unchecked)
-                self.item_table.setItem(row_number, 0, checkbox_item)
-                self.item_table.item(row_number, 0).setTextAlignment(Qt.AlignLeft)
-
-                if self.config.get_useSqlite():
-                    # SQLite data: (barCode, name, price)
-                    barcode_value, description, price = item
-                    item_code = "-"
-                    uom = "-"
-                    unit_price = price
-                    unit_cost = 0.00
-                    location = "-"
-                    location_price = price
-                else:
-                    # SQL Server data: (item_code, description, uom, unit_price, unit_cost, barcode, location, location_price)
-                    item_code, description, uom, unit_price, unit_cost, barcode, location, location_price = item
-                    barcode_value = item_code if barcode is None else barcode
-
-                # Format values
-                formatted_unit_price = f"RM {float(unit_price):.2f}" if unit_price is not None else "RM 0.00"
-                formatted_unit_cost = "RM 0.00"
-                if not barcode_config.get_hide_cost():
-                    formatted_unit_cost = f"RM {float(unit_cost):.2f}" if unit_cost is not None else "RM 0.00"
-                elif barcode_config.get_hide_cost():
-                    formatted_unit_cost = '***'
-                formatted_location_price = f"RM {float(location_price):.2f}" if location_price is not None else "RM 0.00"
-
-                # Set data for table
-                for col_number, value in enumerate([
-                    item_code,
-                    description,
-                    uom,
-                    formatted_unit_price,
-                    formatted_unit_cost,
-                    barcode_value,
-                    location,
-                    formatted_location_price
-                ], start=1):
-                    table_item = QTableWidgetItem(str(value))
-                    table_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-                    table_item.setTextAlignment(Qt.AlignCenter)
-                    self.item_table.setItem(row_number, col_number, table_item)
-
-                # Copies column
-                copies_item = QTableWidgetItem("1")
-                copies_item.setFlags(Qt.ItemIsEditable | Qt.ItemIsEnabled)
-                copies_item.setTextAlignment(Qt.AlignCenter)
-                self.item_table.setItem(row_number, 9, copies_item)
-
-                # Background color for even rows
-                if row_number % 2 == 0:
-                    for col_number in range(self.item_table.columnCount()):
-                        self.item_table.item(row_number, col_number).setBackground(QBrush(QColor(230, 238, 255)))
+    def display_items(self, row_ids, catalog=None, sort_columns=()):
+        """
+        Show catalog rows, given by row id, in the item table; the model pages them in as it is scrolled.
 
+        sort_columns are the columns row_ids are sorted by, ascending; they are
+        shown descending when sort_descending is set.
+        """
+        catalog = catalog if catalog is not None else self.catalog
+        self.displayed_catalog = catalog  # Row ids in the table refer to this catalog
+        self.displayed_sort = sort_columns
+        try:
+            self.logger.info(f"Displaying {len(row_ids)} items.")
+            self.item_model.page_size = self.config.get_item_count()
+            self.item_model.set_rows(catalog, row_ids, self.config.get_hide_cost(), bool(sort_columns) and self.sort_descending)
+            self.update_sort_indicator()
             self.restore_column_widths()
             self.logger.info("Finished displaying items.")
         except Exception as e:
             self.logger.error(f"Error displaying items: {e}")
             QMessageBox.critical(self, 'Error', f"Error displaying items: {e}")
 
-    def start_filter_items_thread(self):
-        try:
-            # Ensure database is connected
-            if not self.db_connected or not hasattr(self, 'all_items'):
-                if not self.warning_shown:
-                    QMessageBox.warning(self, 'Database Error', 'Database is not connected. Searched items will not be shown.')
-                    self.warning_shown = True
-                self.logger.warning("Database is not connected or 'all_items' is not available.")
-                return
-
-            # Get the current text and selected sortBy option
-            search_text = self.item_code_input.text().strip().lower()
-            sort_by = 'barcode'
-
-            self.logger.info(f"Starting filter for items with search text: {search_text}, sorted by: {sort_by}")
-
-            # Terminate any running thread to prevent overlap
-            if hasattr(self, 'filter_items_thread') and self.filter_items_thread.isRunning():
-                self.logger.info("Terminating any running filter thread.")
-                self.filter_items_thread.terminate()
-
-            # Start a new thread for filtering items
-            self.filter_items_thread = FilterItemsBinaryThread(self.all_items, search_text, sort_by)
-            self.filter_items_thread.items_filtered.connect(self.display_items)
-            self.filter_items_thread.start()
-
-            self.logger.info("Started new filter thread for items.")
-        
-        except Exception as e:
-            self.logger.error(f"Error in start_filter_items_thread: {e}")
-            QMessageBox.critical(self, 'Error', f"Error filtering items: {e}")
+    def display_catalog(self):
+        """
+        Show every row of a newly installed catalog. With a sort active the
+        rows are shown unsorted at once, with no sort indicator, and replaced
+        by the sorted rows when the search worker has sorted them.
+        """
+        self.display_items(self.catalog.ids())
+        if self.sort_columns:
+            self.submit_search('barcode', '')
+
+    def materialize_rows(self, first, end):
+        """Format the text of the rows just handed to the table, and of the next page, in the background."""
+        model = self.item_model
+        row_ids = self.display_rows.missing(model.row_ids_between(first, end + model.page_size))
+        if not row_ids:
+            return
+        self.display_rows_worker.submit(
+            self.display_rows.catalog, row_ids, self.display_rows.hide_cost, self.display_rows.stamp
+        )
 
-    def binary_search(self, items, target: str):
-        try:
-            if self.config.get_useSqlite():
-                # SQLite: barcode is at index 0
-                item_codes = [str(item[0]).lower() for item in items]
-            else:
-                # SQL Server: barcode is at index 5
-                item_codes = [str(item[5]).lower() for item in items]
+    def handle_display_rows_ready(self, stamp, rows):
+        self.display_rows.fill(stamp, rows)  # Dropped if prices or hideCost changed meanwhile
 
-            index = bisect_left(item_codes, target.lower())
-            end_index = bisect_right(item_codes, target.lower())
+    def handle_sort_clicked(self, section):
+        """
+        Sort the results by a clicked column; clicking the sorted column again reverses them.
 
-            self.logger.debug(f"Binary search index found: {index}")
+        Shift-click adds the column as a further sort key. Sorting only applies
+        to searches of the loaded catalog, pushdown pages come sorted by the database.
+        """
+        column = ItemTableModel.SORT_COLUMNS.get(section)
+        if column is None or self.pushdown is not None or self.catalog is None:
+            self.update_sort_indicator()
+            return
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier and self.sort_columns:
+            if column in self.sort_columns:
+                self.update_sort_indicator()
+                return
+            self.sort_columns = self.sort_columns + (column,)
+        elif self.sort_columns and self.sort_columns[0] == column and self.displayed_sort == self.sort_columns:
+            self.sort_descending = not self.sort_descending
+            self.item_model.set_reversed(self.sort_descending)  # Same rows, read from the other end
+            self.update_sort_indicator()
+            return
+        else:
+            self.sort_columns = (column,)
+            self.sort_descending = False
+        self.submit_search(self.search_mode, self.search_text)
+
+    def update_sort_indicator(self):
+        header = self.item_table.horizontalHeader()
+        if not self.displayed_sort:
+            header.setSortIndicatorShown(False)
+            return
+        section = next(section for section, column in ItemTableModel.SORT_COLUMNS.items() if column == self.displayed_sort[0])
+        header.setSortIndicator(section, Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder)
+        header.setSortIndicatorShown(True)
 
-            if index < end_index:
-                matching_items = items[index:end_index]
-                self.logger.info(f"Found {len(matching_items)} matching items for target: '{target}'")
-                return matching_items
+    def update_selection_label(self):
+        count = len(self.basket)
+        copies = sum(self.basket.copies.values())
+        self.selection_label.setText(f"{count} selected ({copies} labels)" if count else "")
+        self.clear_selection_button.setVisible(count > 0)
 
-            self.logger.info(f"Item '{target}' not found.")
-            return None
-        except Exception as e:
-            self.logger.error(f"Error during binary search: {e}")
-            return None
+    def clear_selection(self):
+        self.basket.clear()
+        self.item_model.repaint()
+        self.update_selection_label()
 
     def filter_items_binary(self):
-        if not self.db_connected or not hasattr(self, 'all_items'):
+        if self.pushdown is not None:
+            search_text = self.item_code_input.text().strip()
+            self.start_pushdown_search('barcode' if search_text else 'all', search_text)
+            return
+
+        if not (self.db_connected or self.replica_loaded) or self.catalog is None:
             if not self.warning_shown:
                 QMessageBox.warning(self, 'Database Error', 'Database is not connected. Searched items will not be shown.')
                 self.warning_shown = True
@@ -808,23 +2071,15 @@ class BarcodeApp(QMainWindow):
 
         search_text = self.item_code_input.text().strip().lower()
         self.logger.info(f"Searching for items with code: {search_text}")
+        self.submit_search('barcode', search_text)
 
-        if not search_text:
-            self.logger.info("No search text provided, displaying first 100 items.")
-            self.display_items(self.all_items[:100])
+    def filter_items(self, isUOM):
+        if self.pushdown is not None:
+            search_text = self.item_code_input.text().strip()
+            self.start_pushdown_search('item_code' if isUOM else 'description', search_text)
             return
 
-        found_item = self.binary_search(self.all_items, search_text)
-        
-        if found_item:
-            self.logger.info(f"Item found: {found_item}")
-            self.display_items(found_item)
-        else:
-            self.logger.warning(f"No items found for search text: {search_text}")
-            self.display_items([])
-
-    def filter_items(self, isUOM):
-        if not self.db_connected or not hasattr(self, 'all_items'):
+        if not (self.db_connected or self.replica_loaded) or self.catalog is None:
             if not self.warning_shown:
                 QMessageBox.warning(self, 'Database Error', 'Database is not connected. Searched items will not be shown.')
                 self.warning_shown = True
@@ -832,56 +2087,263 @@ class BarcodeApp(QMainWindow):
 
         search_text = self.item_code_input.text().strip().lower()
         self.logger.info(f"Filtering items with search text: {search_text}")
-        keywords = search_text.split()
-        self.logger.info(f"Keywords extracted: {keywords}")
+        self.submit_search('item_code' if isUOM else 'description', search_text)
+
+    def submit_search(self, mode, search_text):
+        """Hand a search to the search worker; any older search still waiting or running is dropped."""
+        self.search_mode = mode
+        self.search_text = search_text
+        # Settings and widgets are read here, the worker thread only reads the catalog and its indexes
+        plu_index = self.get_plu_index() if self.catalog.source == SqlitePluAdapter.source else None
+        facets = (self.uom_filter.currentData(), self.location_filter.currentData(), self.price_filter.currentData())
+        self.search_worker.submit(mode, search_text, plu_index, facets, self.sort_columns)
+
+    def update_facet_filters(self):
+        """Offer the facet values of the current catalog, keeping the selections that still exist."""
+        facets = self.search_indexes["facets"] if self.search_indexes is not None else None
+        for facet_filter, facet, label in (
+                (self.uom_filter, "uom", "All UOMs"), (self.location_filter, "location", "All locations")):
+            current = facet_filter.currentData()
+            facet_filter.clear()
+            facet_filter.addItem(label, None)
+            for value in facets.values(facet) if facets is not None else []:
+                facet_filter.addItem(str(value), value)
+            facet_filter.setCurrentIndex(max(0, facet_filter.findData(current)))
+            facet_filter.setEnabled(facets is not None)
+        self.price_filter.setEnabled(facets is not None)
+
+    def apply_facet_filters(self):
+        if self.pushdown is not None or self.catalog is None:
+            return
+        self.submit_search(self.search_mode, self.search_text)
 
-        if self.config.get_useSqlite():
-            # SQLite: only (barCode, name, price)
-            if not isUOM:
-                filtered_items = [
-                    item for item in self.all_items
-                    if all(keyword in str(item[1]).lower() for keyword in keywords)  # name
-                ]
-            else:
-                filtered_items = [
-                    item for item in self.all_items
-                    if all(keyword in str(item[0]).lower() for keyword in keywords)  # barcode
-                ]
-                if filtered_items:
-                    itemcode = str(filtered_items[0][0])
-                    filtered_items = [
-                        item for item in self.all_items
-                        if str(item[0]).lower() == itemcode.lower()  # exact match
-                    ]
-        else:
-            # SQL Server
-            if not isUOM:
-                    filtered_items = [
-                        item for item in self.all_items
-                        if all(keyword in str(item[1]).lower() for keyword in keywords)  # description
-                    ]
-            else:
-                filtered_items = [
-                    item for item in self.all_items
-                    if all(keyword in str(item[0]).lower() for keyword in keywords)  # item code
-                ]
-        self.logger.info(f"Found {len(filtered_items)} items matching the search criteria.")
-        self.display_items(filtered_items)
+    def facet_mask(self, indexes, facets):
+        """Return the bitmap of rows matching the selected (uom, location, price range) facets, or None."""
+        if indexes is None:
+            return None
+        uom, location, price = facets
+        return indexes["facets"].mask(uom, location, price)
+
+    def handle_search_results(self, generation, catalog_generation, row_ids, note, latency):
+        if generation != self.search_worker.generation or catalog_generation != self.catalog_generation:
+            return  # Overtaken by a newer search, or by a newly installed catalog
+        self.search_latency = latency
+        self.logger.info(f"Found {len(row_ids)} items in {latency * 1000:.1f} ms.")
+        self.statusBar().showMessage(note or f"{len(row_ids)} items found in {latency * 1000:.0f} ms.", 5000)
+        self.display_items(row_ids, sort_columns=self.sort_columns)  # A new sort submits a new search, so these are its columns
+
+    def handle_search_error(self, message):
+        self.logger.error(f"Error searching items: {message}")
+        QMessageBox.critical(self, 'Error', f"Error filtering items: {message}")
+
+    def run_search(self, mode, search_text, plu_index, facets, sort_columns, cancelled):
+        """
+        Search the catalog on the search worker thread, keep the rows matching
+        the facets and sort them by sort_columns, ascending.
 
+        Returns (catalog generation, row ids, status note), or None when
+        cancelled() turned true because a newer search was submitted.
 
-    def print_barcode(self):
-        selected_rows = []
-        send_command = SendCommand()
+        The catalog and its indexes are read once, under the search lock the
+        UI takes to install another catalog, and handed to every helper, so
+        one search never mixes two catalogs.
+        """
+        catalog_generation = self.catalog_generation
+        catalog = self.catalog
+        if catalog is None:
+            return None
+        indexes = self.search_indexes
+        fuzzy_indexes = self.fuzzy_indexes
+        engine = self.sharded_search if not self.sharded_search_stale else None
+        keywords = search_text.split()
+        adapter = get_adapter(catalog.source)
+        note = ""
+
+        mask = self.facet_mask(indexes, facets)
+        if mode == 'barcode':
+            if not search_text:
+                filtered_items = catalog.ids() if mask is None else FacetIndex.filter(catalog.ids(), mask)
+                filtered_items = self.sort_rows(catalog, filtered_items, sort_columns, cancelled)
+                return None if filtered_items is None else (catalog_generation, filtered_items, note)
+            # Search as you type: every barcode starting with the text, else every code starting with it
+            barcode_key = catalog.barcode_key
+            filtered_items = self.cached_search(
+                catalog, catalog_generation, 'barcode', search_text,
+                lambda: self.prefix_index(catalog, 'barcode').prefix(search_text),
+                lambda row_id: barcode_key(row_id).startswith(search_text), prefix=True)
+            if not filtered_items and adapter.code_column != 'barcode':
+                codes = catalog.key_column(adapter.code_column)
+                filtered_items = self.cached_search(
+                    catalog, catalog_generation, 'code', search_text,
+                    lambda: self.prefix_index(catalog, adapter.code_column).prefix(search_text),
+                    lambda row_id: codes[row_id].startswith(search_text), prefix=True)
+        elif mode == 'description':
+            descriptions = catalog.description_keys
+            # FTS5 results are ranked, so filtering a parent query's rows would lose their order
+            ranked = catalog.source == SqlitePluAdapter.source
+            filtered_items = self.cached_search(
+                catalog, catalog_generation, 'description', search_text,
+                lambda: self.search_descriptions(catalog, indexes, engine, search_text, keywords, plu_index, cancelled),
+                None if ranked else lambda row_id: all(keyword in descriptions[row_id] for keyword in keywords))
+            if filtered_items == []:
+                filtered_items, note = self.fuzzy_fallback(catalog, indexes, fuzzy_indexes, keywords, False)
+        else:
+            codes = catalog.key_column(adapter.code_column)
+            filtered_items = self.cached_search(
+                catalog, catalog_generation, 'item_code', search_text,
+                lambda: self.search_codes(catalog, indexes, engine, keywords, codes, cancelled),
+                lambda row_id: all(keyword in codes[row_id] for keyword in keywords))
+            if filtered_items == []:
+                filtered_items, note = self.fuzzy_fallback(catalog, indexes, fuzzy_indexes, keywords, True)
+            if filtered_items and adapter.single_code:
+                filtered_items = self.prefix_index(catalog, adapter.code_column).exact(codes[filtered_items[0]])
+
+        if filtered_items is None:
+            return None
+        if mask is not None:
+            filtered_items = FacetIndex.filter(filtered_items, mask)
+        filtered_items = self.sort_rows(catalog, filtered_items, sort_columns, cancelled)
+        return None if filtered_items is None else (catalog_generation, filtered_items, note)
+
+    def sort_rows(self, catalog, row_ids, sort_columns, cancelled):
+        """Return row_ids sorted by sort_columns on the search worker, ranking columns first as needed; None when cancelled."""
+        if not sort_columns:
+            return row_ids
+        indexes = []
+        for column in sort_columns:
+            index = self.sort_indexes.get(column)
+            if index is None or not index.current(catalog):
+                # Built on first use and after the catalog changed; the catalog's permutation does the sorting
+                index = SortIndex(column).build(catalog, cancelled)
+                if index is None:
+                    return None
+                self.sort_indexes[column] = index
+            indexes.append(index)
+        if cancelled():
+            return None
+        return SortIndex.sort(row_ids, indexes)
+
+    def scan_items(self, catalog, keys, keywords, cancelled):
+        """Return the row ids whose lowercase key contains every keyword, or None when cancelled part way."""
+        filtered_items = []
+        for count, row_id in enumerate(catalog.ids()):
+            if count % 10000 == 0 and cancelled():
+                return None
+            if all(keyword in keys[row_id] for keyword in keywords):
+                filtered_items.append(row_id)
+        return filtered_items
+
+    def search_descriptions(self, catalog, indexes, engine, search_text, keywords, plu_index, cancelled):
+        # Ranked prefix matches from the FTS5 index where there is one, followed by the other substring matches:
+        # its unicode61 tokenizer only matches the start of words and does not split CJK text into words
+        ranked = self.full_text_search(catalog, search_text, plu_index)
+        filtered_items = self.sharded_search_rows(engine, "description", keywords, cancelled)
+        if filtered_items is None:
+            filtered_items = self.indexed_search(catalog, indexes, keywords, "description_ngrams", "description_tokens")
+        if filtered_items is None and (not ranked or any(is_cjk(character) for character in search_text)):
+            # Until the indexes are built, or without any keywords
+            filtered_items = self.scan_items(catalog, catalog.description_keys, keywords, cancelled)
+            if filtered_items is None:
+                return None
+        if ranked is None:
+            return filtered_items
+        if filtered_items:
+            seen = set(ranked)
+            ranked.extend(row_id for row_id in filtered_items if row_id not in seen)
+        return ranked
+
+    def search_codes(self, catalog, indexes, engine, keywords, codes, cancelled):
+        filtered_items = self.sharded_search_rows(engine, get_adapter(catalog.source).code_column, keywords, cancelled)
+        if filtered_items is None:
+            filtered_items = self.indexed_search(catalog, indexes, keywords, "code_ngrams")
+        if filtered_items is None:
+            filtered_items = self.scan_items(catalog, codes, keywords, cancelled)
+        return filtered_items
+
+    def sharded_search_rows(self, engine, column, keywords, cancelled):
+        """Search a large catalog with the worker processes; None when they are not running for it."""
+        if engine is None or column not in engine.columns:
+            return None
+        return engine.search(column, keywords, cancelled)
+
+    def cached_search(self, catalog, catalog_generation, mode, query, search, matches=None, prefix=False):
+        """
+        Return the row ids of search() through the query cache, or None when search() was cancelled.
 
-        # Get selected rows
-        for row in range(self.item_table.rowCount()):
-            if self.item_table.item(row, 0).checkState() == Qt.Checked:
-                selected_rows.append(row)
+        matches(row_id) tests a single row against query; when given, a query
+        refining a cached one is answered by filtering the cached rows, which
+        keeps their order, instead of calling search().
+        """
+        version = (catalog_generation, catalog.version)
+        row_ids = self.query_cache.get(mode, query, version)
+        if row_ids is not None:
+            return row_ids
+        parent = self.query_cache.parent(mode, query, version, prefix) if matches is not None else None
+        if parent is not None:
+            row_ids = [row_id for row_id in parent if matches(row_id)]
+        else:
+            row_ids = search()
+        if row_ids is not None:
+            self.query_cache.put(mode, query, version, row_ids, refinable=matches is not None)
+        return row_ids
+
+    def fuzzy_fallback(self, catalog, indexes, fuzzy_indexes, keywords, isUOM):
+        """Close matches, and a status note, for a search without exact results, so a typo still finds the item."""
+        filtered_items = self.fuzzy_search(catalog, indexes, fuzzy_indexes, keywords, isUOM)
+        if not filtered_items:
+            return [], ""
+        self.logger.info(f"No exact matches, {len(filtered_items)} close matches found.")
+        return filtered_items, f"No exact matches for '{' '.join(keywords)}', showing close matches."
 
+    def print_barcode(self):
+        """Print the items in the selection basket, with their copies."""
+        # The picked rows, as (row id, copies) of the basket's catalog, whatever the table shows
+        selected_rows = self.basket.items()
         if not selected_rows:
             self.logger.warning("No items selected for printing.")
             QMessageBox.warning(self, 'Selection Error', 'No items selected for printing.')
             return
+        self.start_print_job(self.basket.catalog, selected_rows)
+
+    def print_all_results(self):
+        """Print one label per row of the current results (the basket's copies for picked rows)."""
+        model = self.item_model
+        if not model.row_ids or self.displayed_catalog is None:
+            QMessageBox.warning(self, 'Selection Error', 'There are no results to print.')
+            return
+        if self.pushdown is not None:
+            # The pages of a pushdown search are read again from the database by the print job
+            mode, text, _ = self.pushdown_request
+            answer = QMessageBox.question(
+                self, 'Print All Results',
+                "Print labels for every item matching the current search? They are read from the database as they print.",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if answer == QMessageBox.Yes:
+                self.start_print_job(None, None, (mode, text))
+            return
+        catalog = self.displayed_catalog
+        row_ids = reversed(model.row_ids) if model.reversed else model.row_ids  # In the order shown
+        # Rows replaced by a delta keep their old values until the search is run again; a MappedCatalog never changes
+        alive = getattr(catalog, "alive", None)
+        rows = [(row_id, self.basket.get(catalog, row_id) or 1) for row_id in row_ids if alive is None or alive[row_id]]
+        if not rows:
+            QMessageBox.warning(self, 'Selection Error', 'The results have changed, search again to print them.')
+            return
+        labels = sum(copies for _, copies in rows)
+        answer = QMessageBox.question(
+            self, 'Print All Results', f"Print {labels} labels for all {len(rows)} items in the results?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer == QMessageBox.Yes:
+            self.start_print_job(catalog, rows)
+
+    def start_print_job(self, catalog, rows, pushdown_search=None):
+        """
+        Ask for the remark, then render and send the labels of (row id, copies) rows in the background,
+        or of every row of a pushdown search given as (mode, text).
+        """
+        if self.print_job_thread is not None and self.print_job_thread.isRunning():
+            QMessageBox.warning(self, 'Printer Busy', 'A print job is still running.')
+            return
 
         # Show the Remark Dialog
         remark_dialog = RemarkDialog()
@@ -893,121 +2355,74 @@ class BarcodeApp(QMainWindow):
         else:
             remark_text = ""  # User clicked "Cancel," so no remark
 
-        printer = None  # Ensure we initialize the printer variable
+        # Settings are read here, the job thread only renders and sends
         try:
-            self.logger.info("USB mode selected. Checking printer connection...")
-
-            if self.config.get_use_generic_driver():
-                printer = usb.core.find(idVendor=self.config.get_vid(), idProduct=self.config.get_pid(), backend=self.backend)
-
-                if printer is None:
-                    self.logger.error(f"Printer not found (Vendor ID: {self.config.get_vid()}, Product ID: {self.config.get_pid()}).")
-                    QMessageBox.warning(self, 'Printer Error', 'Printer not found. Check your device and USB permissions.')
-                    return
-
-                try:
-                    printer.set_configuration()
-                    self.logger.info("Printer connected via USB.")
-                except usb.core.USBError as e:
-                    self.logger.error(f"Failed to configure USB printer: {e}")
-                    QMessageBox.warning(self, 'Printer Error', f"Failed to configure USB printer: {e}")
-                    return
-
-            else:
-                self.logger.info("Wireless mode selected. Validating IP and port...")
-                try:
-                    ip, port = self.config.get_ip_address().split(":")
-                except ValueError as e:
-                    self.logger.error(f"Invalid IP or port: {e}")
-                    QMessageBox.warning(self, 'Printer Error', f"Invalid IP or port: {e}")
-                    return
-
-            # Process selected items
-            for row in selected_rows:
-                description = self.item_table.item(row, 2).text()
-                description = description.replace('"', '')
-                unit_price_integer = self.item_table.item(row, 8).text()
-                barcode_value = self.item_table.item(row, 6).text()
-                copies = self.item_table.item(row, 9).text()
-
-                self.logger.info(f"Preparing to print item: {description} (Barcode: {barcode_value})")
-                
-                tpsl_template = self.config.get_tpsl_template()
-                zpl_template = self.config.get_zpl_template()
-                
-
-                printer_clear = ""
-                print_data = ""
-                if not self.config.get_use_zpl():
-                    printer_clear = "CLS"
-                    if self.config.get_tpslSize() == self.options[1]:
-                        tpsl_template = self.config.get_tpsl_size80_template()
-                    elif self.config.get_tpslSize() == self.options[2]:
-                        tpsl_template = self.config.get_tpsl_size3_template()
-                    print_data = self.replace_placeholders(
-                        tpsl_template,
-                        companyName=self.config.get_company_name(),
-                        description=description,
-                        remark=remark_text,
-                        barcode_value=barcode_value,
-                        unit_price_integer=unit_price_integer,
-                        copies=copies,
-                    )
-                else:
-                    printer_clear = "^XA^CLS^XZ"
-                    if self.config.get_zplSize() == self.options[1]:
-                        tpsl_template = self.config.get_zpl_size80_template()
-                    elif self.config.get_zplSize() == self.options[2]:
-                        tpsl_template = self.config.get_zpl_size3_template()
-                    print_data = self.replace_placeholders(
-                        self.config.get_zpl_template(),
-                        companyName=self.config.get_company_name(),
-                        description=description,
-                        remark=remark_text,
-                        barcode_value=barcode_value,
-                        unit_price_integer=unit_price_integer,
-                        copies=copies,
-                    )
-                    # Add remark to ZPL command
-                    if remark_text:
-                        print_data += f"\n^FO10,180^A0N,15,20^FDRemark: {remark_text}^FS"
-
-                if self.config.get_use_generic_driver():
-                    if printer is not None:
-                        printer.write(self.endpoint, print_data.encode('utf-8'))
-                        self.logger.info(f"Barcode print command sent successfully for item: {barcode_value}")
-                    else:
-                        self.logger.error("Printer is not available.")
-                elif self.config.get_wireless_mode():
-                    send_command.send_wireless_command(ip_address=ip, port=port, command=printer_clear)
-                    send_command.send_wireless_command(ip_address=ip, port=port, command=print_data)
-                    self.logger.info(f"Wireless print command sent to {ip}:{port} for item: {barcode_value}")
-                elif not self.config.get_use_generic_driver():
-                    send_command.send_win32print(self.config.get_printer_name(), printer_clear)
-                    send_command.send_win32print(self.config.get_printer_name(), print_data)
-
-        except usb.core.USBError as e:
-            self.logger.error(f"USB Error: {e}")
-            QMessageBox.information(self, 'Error', f'{e}')
-        except ValueError as e:
-            self.logger.error(f"Value Error: {e}")
-            QMessageBox.information(self, 'Error', f'{e}')
-        finally:
-            # Show success message once after all items are printed
-            if not self.config.get_wireless_mode() and self.config.get_use_generic_driver():
-                self.logger.info('All selected items have been successfully sent to the printer (USB).')
-                QMessageBox.information(self, 'Success', 'All selected items have been successfully sent to the printer!')
-                usb.util.dispose_resources(printer)
-
-            elif not self.config.get_wireless_mode() and not self.config.get_use_generic_driver():
-                self.logger.info('All selected items have been successfully sent to the printer (win32print).')
-                QMessageBox.information(self, 'Success', 'All selected items have been successfully sent to the printer!')
-
-            else:
-                self.logger.info('All selected items have been successfully sent to the printer (wireless).')
-                QMessageBox.information(self, 'Success', 'All selected items have been successfully sent to the printer!')
+            transport = LabelTransport.from_config(self.config, self.backend)
+        except (ValueError, OSError) as e:
+            self.logger.error(f"Invalid printer settings: {e}")
+            QMessageBox.warning(self, 'Printer Error', f"Invalid printer settings: {e}")
+            return
+        renderer = LabelRenderer.from_config(self.config, self.options, remark_text)
+        if pushdown_search is not None:
+            copies = {SelectionBasket.row_key(self.basket.catalog, row_id): count for row_id, count in self.basket.items()}
+            self.print_job_thread = PushdownPrintJobThread(
+                self.pushdown, *pushdown_search, copies, renderer, transport, max(self.config.get_item_count(), 200)
+            )
+        else:
+            self.print_job_thread = PrintJobThread(catalog, rows, renderer, transport, self.search_worker.lock)
+        total = self.print_job_thread.total
+        self.logger.info(f"Printing {total or 'all matching'} items to {transport.describe()}...")
+        self.print_job_thread.progress.connect(self.handle_print_progress)
+        self.print_job_thread.completed.connect(self.handle_print_completed)
+        self.print_job_thread.error_occurred.connect(self.handle_print_error)
+        self.print_job_thread.finished.connect(self.handle_print_finished)
+        self.print_progress.setRange(0, total)  # A busy bar when the number of rows is unknown
+        self.print_progress.setValue(0)
+        self.print_progress.setFormat(f"0 / {total} items" if total else "0 items")
+        self.print_progress.setVisible(True)
+        self.stop_print_button.setVisible(True)
+        self.print_button.setEnabled(False)
+        self.print_all_button.setEnabled(False)
+        self.print_job_thread.start()
+
+    def stop_print_job(self):
+        if self.print_job_thread is not None and self.print_job_thread.isRunning():
+            self.logger.info("Stopping the running print job...")
+            self.print_job_thread.requestInterruption()
+
+    def handle_print_progress(self, sent, total, labels, seconds):
+        rate = labels / seconds if seconds > 0 else 0.0
+        self.print_progress.setValue(sent)
+        self.print_progress.setFormat(f"{sent} / {total} items, {rate:.0f} labels/s" if total else f"{sent} items, {rate:.0f} labels/s")
+
+    def handle_print_completed(self, sent, labels, seconds, cancelled):
+        rate = labels / seconds if seconds > 0 else 0.0
+        missing = self.print_job_thread.renderer.missing
+        if missing:
+            self.logger.warning(f"Missing placeholder for: {', '.join(sorted(missing))}")
+        if cancelled:
+            self.logger.info(f"Print job stopped after {sent} items ({labels} labels).")
+            QMessageBox.information(self, 'Printing Stopped', f"Printing stopped after {sent} items ({labels} labels).")
+            return
+        self.logger.info(f"Sent {labels} labels for {sent} items in {seconds:.1f} s ({rate:.0f} labels/s).")
+        QMessageBox.information(
+            self, 'Success', f"{labels} labels for {sent} items have been sent to the printer ({rate:.0f} labels/s).")
+
+    def handle_print_error(self, message):
+        self.logger.error(message)
+        QMessageBox.warning(self, 'Printer Error', message)
+
+    def handle_print_finished(self):
+        self.print_progress.setVisible(False)
+        self.stop_print_button.setVisible(False)
+        self.print_button.setEnabled(True)
+        self.print_all_button.setEnabled(True)
+        if self.config_reload_pending:
+            self.print_job_thread.wait()  # It emitted finished as its last step
+            self.handle_config_change()
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # The frozen executable is re-run to start each search process
     app = QApplication(sys.argv)
     window = BarcodeApp()
     window.showMaximized()
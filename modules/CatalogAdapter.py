@@ -0,0 +1,47 @@
+class CatalogAdapter:
+    """
+    One catalog source: converts its rows to CatalogStore.COLUMNS order and
+    tells the UI what the source offers.
+
+    Rows are converted once, in the fetch worker, so display, search and
+    printing never need to know which schema a row came from. A new source
+    only needs a new adapter registered in ADAPTERS.
+    """
+
+    source = None  # Name stored on CatalogStore.source and in snapshots
+    code_column = "item_code"  # Column matched by the Get UOM search
+    single_code = False  # Get UOM narrows the matches down to the first code found
+    has_locations = True
+
+    def to_row(self, row):
+        return tuple(row)
+
+
+class SqlServerItemAdapter(CatalogAdapter):
+    """ItemUOM rows from CatalogQuery, which already selects them in column order."""
+
+    source = "sqlserver"
+
+
+class SqlitePluAdapter(CatalogAdapter):
+    """Tbl_Plu rows (barCode, name, price); the file has no item code, UOM, cost or location."""
+
+    source = "plu"
+    code_column = "barcode"
+    single_code = True
+    has_locations = False
+
+    SELECT_SQL = "SELECT barCode, name, price FROM Tbl_Plu;"
+    COUNT_SQL = "SELECT COUNT(*) FROM Tbl_Plu;"
+
+    def to_row(self, row):
+        barcode, name, price = row[0], row[1], row[2]
+        return ("-", name, "-", price, 0.00, barcode, "-", price)
+
+
+ADAPTERS = {adapter.source: adapter for adapter in (SqlServerItemAdapter(), SqlitePluAdapter())}
+
+
+def get_adapter(source):
+    """Return the adapter for a catalog's source name; catalogs without one come from SQL Server."""
+    return ADAPTERS.get(source, ADAPTERS["sqlserver"])
@@ -0,0 +1,222 @@
+import time
+import pyodbc
+from modules.logger_config import setup_logger
+
+
+class CatalogQuery:
+    """
+    Parameterized SQL Server statements for the item catalog.
+
+    Each statement runs on its own cursor that is kept between refreshes.
+    pyodbc prepares a statement once and reuses it when the same SQL text is
+    executed again on the same cursor, and since every value (location, sync
+    token) is passed as a parameter, SQL Server can reuse one cached plan for
+    every terminal and location. The connection has no MARS, so only one
+    cursor may hold pending results at a time: every result is read to the
+    end (scalar() included) before the next statement runs, and a stream
+    given up half-read is closed with discard().
+
+    The connection is checked out of a ConnectionPool lazily, on first use,
+    so a worker thread can pay for the login instead of the UI, and it stays
+    checked out until close() so the prepared statements survive refreshes.
+    Timings of every execution are kept in timings.
+    """
+
+    CATALOG_SQL = """
+        WITH BaseItems AS (
+            SELECT
+                u.ItemCode,
+                i.Description AS DescriptionWithUOM,
+                u.UOM,
+                u.Price AS DefaultUnitPrice,
+                u.Cost,
+                ISNULL(NULLIF(u.BarCode, ''), i.ItemCode) AS Barcode,
+                ISNULL(p.Location, 'HQ') AS Location,
+                ISNULL(p.Price, u.Price) AS PosUnitPrice
+            FROM dbo.ItemUOM u
+            LEFT JOIN dbo.Item i ON u.ItemCode = i.ItemCode
+            LEFT JOIN dbo.PosPricePlan p ON u.ItemCode = p.ItemCode AND p.Location = ?
+        )
+        SELECT * FROM BaseItems;
+    """
+
+    COUNT_SQL = "SELECT COUNT(*) FROM dbo.ItemUOM;"
+
+    SYNC_TOKEN_SQL = "SELECT CHANGE_TRACKING_CURRENT_VERSION();"
+
+    MIN_VALID_VERSION_SQL = "SELECT CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID(?));"
+
+    PRIMARY_KEY_SQL = """
+        SELECT c.name
+        FROM sys.indexes i
+        JOIN sys.index_columns ic ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+        JOIN sys.columns c ON ic.object_id = c.object_id AND ic.column_id = c.column_id
+        WHERE i.is_primary_key = 1 AND i.object_id = OBJECT_ID(?);
+    """
+
+    CHANGED_ROWS_SQL = """
+        WITH Changed AS ({changed_sql})
+        SELECT
+            u.ItemCode,
+            i.Description AS DescriptionWithUOM,
+            u.UOM,
+            u.Price AS DefaultUnitPrice,
+            u.Cost,
+            ISNULL(NULLIF(u.BarCode, ''), i.ItemCode) AS Barcode,
+            ISNULL(p.Location, 'HQ') AS Location,
+            ISNULL(p.Price, u.Price) AS PosUnitPrice
+        FROM dbo.ItemUOM u
+        LEFT JOIN dbo.Item i ON u.ItemCode = i.ItemCode
+        LEFT JOIN dbo.PosPricePlan p ON u.ItemCode = p.ItemCode AND p.Location = ?
+        WHERE u.ItemCode IN (SELECT ItemCode FROM Changed);
+    """
+
+    DELETED_ROWS_SQL = "SELECT COUNT(*) FROM CHANGETABLE(CHANGES {table}, ?) AS c WHERE c.SYS_CHANGE_OPERATION = 'D';"
+
+    TRACKED_TABLES = ("dbo.ItemUOM", "dbo.Item", "dbo.PosPricePlan")
+
+    def __init__(self, pool):
+        self.logger = setup_logger("CatalogQuery")
+        self.pool = pool
+        self._connection = None
+        self._cursors = {}
+        self._changed_sql = None  # Built once from the primary keys, then reused so its plan is cached too
+        self._joined_tables = ()  # Tracked tables whose changes are mapped to item codes through a join
+        self.timings = {}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = self.pool.acquire(timeout=30)
+        return self._connection
+
+    def is_connected(self):
+        return self._connection is not None
+
+    def cursor(self, name):
+        """Return the long-lived cursor dedicated to one named statement."""
+        cursor = self._cursors.get(name)
+        if cursor is None:
+            cursor = self.connection.cursor()
+            self._cursors[name] = cursor
+        return cursor
+
+    def discard(self, name):
+        """Close a statement's cursor, e.g. when its result set was abandoned half-read."""
+        cursor = self._cursors.pop(name, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except pyodbc.Error as e:
+                self.logger.warning(f"Error closing cursor for '{name}': {e}")
+
+    def close(self, discard=False):
+        """Close the cursors and hand the connection back to the pool; discard drops a broken connection."""
+        for name in list(self._cursors):
+            self.discard(name)
+        self._changed_sql = None
+        self._joined_tables = ()
+        if self._connection is not None:
+            self.pool.release(self._connection, discard=discard)
+            self._connection = None
+
+    def record_timing(self, name, elapsed):
+        timing = self.timings.setdefault(name, {"executions": 0, "last": 0.0, "total": 0.0})
+        timing["executions"] += 1
+        timing["last"] = elapsed
+        timing["total"] += elapsed
+        self.logger.debug(f"Query '{name}' took {elapsed * 1000:.1f} ms")
+
+    def execute(self, name, sql, params=()):
+        """Execute a statement on its own cursor, recording how long the execute took."""
+        cursor = self.cursor(name)
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        self.record_timing(name, time.perf_counter() - start)
+        return cursor
+
+    def scalar(self, name, sql, params=()):
+        """Execute a statement and return the first column of its first row, or None; the result is read to the end."""
+        rows = self.execute(name, sql, params).fetchall()
+        return rows[0][0] if rows else None
+
+    def timing_summary(self):
+        return ", ".join(
+            f"{name}: {timing['last'] * 1000:.1f} ms (x{timing['executions']})"
+            for name, timing in self.timings.items()
+        )
+
+    def count_items(self):
+        count = self.scalar("count", self.COUNT_SQL)
+        return int(count) if count is not None else 0
+
+    def sync_token(self):
+        """Return the current change tracking version, or None when change tracking is off."""
+        try:
+            return self.scalar("sync_token", self.SYNC_TOKEN_SQL)
+        except pyodbc.Error as e:
+            self.logger.warning(f"Change tracking version unavailable: {e}")
+            return None
+
+    def catalog(self, location):
+        """Execute the catalog query for a location and return the cursor to stream rows from."""
+        return self.execute("catalog", self.CATALOG_SQL, (location,))
+
+    def changed_item_codes_sql(self):
+        """
+        Build a UNION of the ItemCodes changed in every tracked table.
+
+        Returns (sql, None) on success or (None, reason) when change tracking is
+        not usable. The sql takes the sync token once per tracked table.
+        """
+        if self._changed_sql is not None:
+            return self._changed_sql, None
+
+        parts = []
+        joined_tables = []
+        for table in self.TRACKED_TABLES:
+            keys = [row[0] for row in self.execute("primary_key", self.PRIMARY_KEY_SQL, (table,)).fetchall()]
+            if not keys:
+                return None, f"{table} has no primary key for change tracking"
+            if "itemcode" in (key.lower() for key in keys):
+                # ItemCode is part of the key, so deleted rows are reported too
+                parts.append(f"SELECT c.ItemCode FROM CHANGETABLE(CHANGES {table}, ?) AS c")
+            else:
+                join = " AND ".join(f"t.[{key}] = c.[{key}]" for key in keys)
+                parts.append(f"SELECT t.ItemCode FROM CHANGETABLE(CHANGES {table}, ?) AS c JOIN {table} t ON {join}")
+                joined_tables.append(table)
+        self._changed_sql = " UNION ".join(parts)
+        self._joined_tables = tuple(joined_tables)
+        return self._changed_sql, None
+
+    def check_deleted_rows(self, sync_token):
+        """
+        Return None if every deletion since sync_token maps to an item code, otherwise the reason it does not.
+
+        A row deleted from a table keyed without ItemCode is gone from the join
+        changed_item_codes_sql maps its changes with, so its item would keep
+        stale values; only a full fetch can bring them back in line.
+        """
+        for table in self._joined_tables:
+            if self.scalar(f"deleted_rows {table}", self.DELETED_ROWS_SQL.format(table=table), (sync_token,)):
+                return f"Rows were deleted from {table}, which cannot be traced to their items"
+        return None
+
+    def check_sync_token(self, sync_token):
+        """Return None if a delta from sync_token is possible, otherwise the reason it is not."""
+        for table in self.TRACKED_TABLES:
+            min_valid = self.scalar("min_valid_version", self.MIN_VALID_VERSION_SQL, (table,))
+            if min_valid is None:
+                return f"Change tracking is not enabled on {table}"
+            if sync_token < min_valid:
+                return f"Sync token {sync_token} is older than the retention of {table}"
+        return None
+
+    def changed_item_codes(self, changed_sql, sync_token):
+        params = [sync_token] * len(self.TRACKED_TABLES)
+        return [row[0] for row in self.execute("changed_codes", f"{changed_sql};", params).fetchall()]
+
+    def changed_rows(self, changed_sql, sync_token, location):
+        params = [sync_token] * len(self.TRACKED_TABLES) + [location]
+        sql = self.CHANGED_ROWS_SQL.format(changed_sql=changed_sql)
+        return self.execute("changed_rows", sql, params).fetchall()
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import time
+from modules.logger_config import setup_logger
+
+
+class CatalogReplica:
+    """
+    Local SQLite copy of the SQL Server catalog, kept per location.
+
+    The replica lets the main window show items straight away on startup and
+    keep printing while SQL Server is slow or unreachable. Rows are stored in
+    the same column order as the SQL Server fetch:
+    (item_code, description, uom, unit_price, unit_cost, barcode, location, location_price)
+    """
+
+    FILE_NAME = "catalog_replica.db"
+
+    def __init__(self, directory="C:/barcode"):
+        self.logger = setup_logger("CatalogReplica")
+        self.directory = directory or "C:/barcode"
+        self.path = os.path.join(self.directory, self.FILE_NAME)
+
+    def connect(self):
+        """Open the replica database, creating the schema on first use."""
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                location TEXT NOT NULL,
+                item_code TEXT,
+                description TEXT,
+                uom TEXT,
+                unit_price REAL,
+                unit_cost REAL,
+                barcode TEXT,
+                price_location TEXT,
+                location_price REAL,
+                barcode_key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_location_barcode ON items (location, barcode_key);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                location TEXT PRIMARY KEY,
+                synced_at REAL,
+                row_count INTEGER,
+                sync_token INTEGER
+            );
+        """)
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(sync_state)")]
+        if "sync_token" not in columns:
+            # Replicas written before delta refresh existed have no token column yet
+            connection.execute("ALTER TABLE sync_state ADD COLUMN sync_token INTEGER")
+        return connection
+
+    def _row_values(self, location, item):
+        return (
+            location, item[0], item[1], item[2],
+            float(item[3]) if item[3] is not None else None,
+            float(item[4]) if item[4] is not None else None,
+            item[5], item[6],
+            float(item[7]) if item[7] is not None else None,
+            str(item[5]).lower(),
+        )
+
+    def load(self, location):
+        """Return the replicated rows for a location, sorted by barcode, or an empty list."""
+        if not os.path.exists(self.path):
+            self.logger.info(f"No catalog replica found at {self.path}")
+            return []
+
+        connection = None
+        try:
+            connection = self.connect()
+            cursor = connection.execute(
+                "SELECT item_code, description, uom, unit_price, unit_cost, barcode, price_location, location_price "
+                "FROM items WHERE location = ? ORDER BY barcode_key",
+                (location,),
+            )
+            items = cursor.fetchall()
+            self.logger.info(f"Loaded {len(items)} items for location '{location}' from the catalog replica.")
+            return items
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to load catalog replica: {e}")
+            return []
+        finally:
+            if connection:
+                connection.close()
+
+    def save(self, location, items, sync_token=None):
+        """Replace the replicated rows for a location with a freshly fetched catalog."""
+        connection = None
+        try:
+            connection = self.connect()
+            with connection:
+                connection.execute("DELETE FROM items WHERE location = ?", (location,))
+                connection.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._row_values(location, item) for item in items),
+                )
+                row_count = connection.execute(
+                    "SELECT COUNT(*) FROM items WHERE location = ?", (location,)
+                ).fetchone()[0]
+                connection.execute(
+                    "INSERT OR REPLACE INTO sync_state (location, synced_at, row_count, sync_token) VALUES (?, ?, ?, ?)",
+                    (location, time.time(), row_count, sync_token),
+                )
+            self.logger.info(f"Saved {row_count} items for location '{location}' to the catalog replica.")
+            return True
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to save catalog replica: {e}")
+            return False
+        finally:
+            if connection:
+                connection.close()
+
+    def apply_delta(self, location, changed_item_codes, rows, sync_token):
+        """Replace the rows of the changed item codes and record the new sync token."""
+        connection = None
+        try:
+            connection = self.connect()
+            with connection:
+                connection.executemany(
+                    "DELETE FROM items WHERE location = ? AND item_code = ?",
+                    ((location, item_code) for item_code in changed_item_codes),
+                )
+                connection.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self._row_values(location, item) for item in rows),
+                )
+                connection.execute(
+                    "UPDATE sync_state SET synced_at = ?, sync_token = ?, "
+                    "row_count = (SELECT COUNT(*) FROM items WHERE location = ?) WHERE location = ?",
+                    (time.time(), sync_token, location, location),
+                )
+            self.logger.info(f"Applied delta of {len(changed_item_codes)} item codes to the catalog replica.")
+            return True
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to apply delta to catalog replica: {e}")
+            return False
+        finally:
+            if connection:
+                connection.close()
+
+    def sync_token(self, location):
+        """Return the change tracking version the replica was last synced at, or None."""
+        if not os.path.exists(self.path):
+            return None
+
+        connection = None
+        try:
+            connection = self.connect()
+            row = connection.execute(
+                "SELECT sync_token FROM sync_state WHERE location = ?", (location,)
+            ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to read replica sync token: {e}")
+            return None
+        finally:
+            if connection:
+                connection.close()
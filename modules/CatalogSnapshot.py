@@ -0,0 +1,246 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from modules.CatalogStore import CatalogStore
+from modules.logger_config import setup_logger
+
+
+class _StringColumn:
+    """Read-only string column decoded from the mapped buffer one value at a time."""
+
+    def __init__(self, buffer, offsets, data, nulls):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._data = data
+        self._nulls = nulls
+
+    def __len__(self):
+        return len(self._nulls)
+
+    def __getitem__(self, row_id):
+        if isinstance(row_id, slice):
+            return [self[i] for i in range(*row_id.indices(len(self)))]
+        if self._nulls[row_id]:
+            return None
+        start = self._data + self._offsets[row_id]
+        end = self._data + self._offsets[row_id + 1]
+        return str(self._buffer[start:end], "utf-8")
+
+    def __iter__(self):
+        for row_id in range(len(self)):
+            yield self[row_id]
+
+
+class MappedCatalog:
+    """
+    Catalog read straight from a memory-mapped CatalogSnapshot file.
+
+    It offers the read side of CatalogStore (columns indexed by row id, ids(),
+    record(), barcode_key()), so it can be searched, displayed and printed
+    from as soon as the file is mapped. Rows were written in barcode order,
+    so row ids are their positions and ids() needs no stored order. Call
+    to_store() for a CatalogStore with the same row ids before changing it.
+    """
+
+    COLUMNS = CatalogStore.COLUMNS
+    KEY_COLUMNS = CatalogStore.KEY_COLUMNS
+    PRICE_COLUMNS = CatalogStore.PRICE_COLUMNS
+
+    def __init__(self, mapped, header, data_start):
+        self._mapped = mapped
+        self._buffer = memoryview(mapped)
+        self.key = header["key"]
+        self.sync_token = header["sync_token"]
+        self.source = header.get("source", "sqlserver")
+        self.live_count = header["rows"]
+        self.version = 0
+        self._permutations = {}
+        self._views = []
+
+        def section(name, typecode=None):
+            offset, length = header["sections"][name]
+            view = self._buffer[data_start + offset:data_start + offset + length]
+            if typecode is not None:
+                view = view.cast(typecode)
+            self._views.append(view)
+            return view, data_start + offset
+
+        for name in CatalogSnapshot.STRING_COLUMNS:
+            offsets, _ = section(f"{name}.offsets", "Q")
+            nulls, _ = section(f"{name}.nulls")
+            _, data = section(f"{name}.data")
+            setattr(self, name, _StringColumn(self._buffer, offsets, data, nulls))
+        for name in CatalogSnapshot.PRICE_COLUMNS:
+            setattr(self, name, section(name, "d")[0])
+        self._order = range(self.live_count)
+
+    def __len__(self):
+        return self.live_count
+
+    def ids(self):
+        return self._order
+
+    def barcode_key(self, row_id):
+        return self.barcode_keys[row_id]
+
+    key_column = CatalogStore.key_column
+    sort_key = CatalogStore.sort_key
+    permutation = CatalogStore.permutation
+
+    def record(self, row_id):
+        """Return the row as a tuple in COLUMNS order, with NULL prices as None."""
+        return (
+            self.item_code[row_id],
+            self.description[row_id],
+            self.uom[row_id],
+            CatalogStore._nullable(self.unit_price[row_id]),
+            CatalogStore._nullable(self.unit_cost[row_id]),
+            self.barcode[row_id],
+            self.location[row_id],
+            CatalogStore._nullable(self.location_price[row_id]),
+        )
+
+    def records(self):
+        for row_id in self._order:
+            yield self.record(row_id)
+
+    def to_store(self):
+        """Copy the rows into a CatalogStore; the row ids and barcode order stay the same."""
+        store = CatalogStore(self.source)
+        store.extend(self.records())
+        store.order = list(self._order)
+        store.version += 1
+        return store
+
+    def close(self):
+        """Unmap the file, e.g. before a new snapshot replaces it. The catalog is unusable afterwards."""
+        for view in self._views:
+            view.release()
+        self._buffer.release()
+        self._mapped.close()
+
+
+class CatalogSnapshot:
+    """
+    Versioned binary snapshot of the sorted catalog, reopened with mmap on startup.
+
+    Building a CatalogStore from the replica creates Python objects for every
+    row, which is most of the startup time on large catalogs. The snapshot
+    stores each column as a flat buffer instead (UTF-8 strings with an offset
+    table, prices as doubles) along with the lowercase search key columns,
+    all in barcode order, and MappedCatalog reads values out of the mapping
+    only when they are asked for.
+
+    The header records the format version, the byte order, the source key the
+    rows came from and the sync token they are consistent with; a snapshot
+    that does not match is ignored.
+    """
+
+    FILE_NAME = "catalog_snapshot.bin"
+    MAGIC = b"BCSNAP\0\0"
+    FORMAT_VERSION = 2
+    STRING_COLUMNS = (
+        "item_code", "description", "uom", "barcode", "location",
+        "item_code_keys", "description_keys", "barcode_keys",
+    )
+    PRICE_COLUMNS = ("unit_price", "unit_cost", "location_price")
+    _PREFIX = struct.Struct("<8sII")  # Magic, format version, header length
+
+    def __init__(self, directory="C:/barcode"):
+        self.logger = setup_logger("CatalogSnapshot")
+        self.directory = directory or "C:/barcode"
+        self.path = os.path.join(self.directory, self.FILE_NAME)
+
+    @staticmethod
+    def _string_sections(values):
+        offsets = array('Q', [0])
+        nulls = bytearray()
+        chunks = []
+        size = 0
+        for value in values:
+            if value is None:
+                nulls.append(1)
+            else:
+                nulls.append(0)
+                encoded = str(value).encode("utf-8")
+                chunks.append(encoded)
+                size += len(encoded)
+            offsets.append(size)
+        return offsets.tobytes(), bytes(nulls), b"".join(chunks)
+
+    def save(self, catalog, key, sync_token=None):
+        """Write the live rows of a CatalogStore in barcode order. Returns True on success."""
+        row_ids = catalog.ids()
+        sections = {}
+        for name in self.STRING_COLUMNS:
+            column = getattr(catalog, name)
+            values = [column[row_id] for row_id in row_ids]
+            offsets, nulls, data = self._string_sections(values)
+            sections[f"{name}.offsets"] = offsets
+            sections[f"{name}.nulls"] = nulls
+            sections[f"{name}.data"] = data
+        for name in self.PRICE_COLUMNS:
+            column = getattr(catalog, name)
+            sections[name] = array('d', (column[row_id] for row_id in row_ids)).tobytes()
+
+        layout = {}
+        position = 0
+        for name, data in sections.items():
+            layout[name] = [position, len(data)]
+            position += len(data) + (-len(data) % 8)  # Keep every section 8-byte aligned for the casts
+        header = json.dumps({
+            "key": key,
+            "sync_token": sync_token,
+            "source": catalog.source,
+            "rows": len(row_ids),
+            "byteorder": sys.byteorder,
+            "sections": layout,
+        }).encode("utf-8")
+        header += b" " * (-(self._PREFIX.size + len(header)) % 8)
+
+        temporary_path = self.path + ".tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temporary_path, "wb") as file:
+                file.write(self._PREFIX.pack(self.MAGIC, self.FORMAT_VERSION, len(header)))
+                file.write(header)
+                for data in sections.values():
+                    file.write(data)
+                    file.write(b"\0" * (-len(data) % 8))
+            os.replace(temporary_path, self.path)
+            self.logger.info(f"Saved catalog snapshot of {len(row_ids)} rows for {key}.")
+            return True
+        except OSError as e:
+            self.logger.error(f"Failed to save catalog snapshot: {e}")
+            return False
+
+    def open(self, key):
+        """Map the snapshot and return a MappedCatalog, or None when it is missing, stale or unreadable."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Could not map catalog snapshot: {e}")
+            return None
+
+        try:
+            magic, version, header_length = self._PREFIX.unpack_from(mapped, 0)
+            if magic != self.MAGIC or version != self.FORMAT_VERSION:
+                self.logger.info("Ignoring catalog snapshot written by another format version.")
+                mapped.close()
+                return None
+            header = json.loads(mapped[self._PREFIX.size:self._PREFIX.size + header_length])
+            if header["byteorder"] != sys.byteorder or header["key"] != key:
+                self.logger.info(f"Ignoring catalog snapshot for {header['key']}, expected {key}.")
+                mapped.close()
+                return None
+            return MappedCatalog(mapped, header, self._PREFIX.size + header_length)
+        except (struct.error, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable catalog snapshot: {e}")
+            mapped.close()
+            return None
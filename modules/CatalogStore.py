@@ -0,0 +1,210 @@
+import math
+from array import array
+from bisect import insort
+
+
+class CatalogStore:
+    """
+    Columnar in-memory catalog addressed by stable integer row ids.
+
+    Every column is a parallel list or array indexed by row id, so the catalog
+    is held once and search, display and printing pass row ids around instead
+    of copying rows. Prices are kept in float arrays (NaN stands for NULL) and
+    the repetitive UOM and location strings are deduplicated.
+
+    Row ids never change: removed rows are only marked dead, and rows added by
+    a refresh get new ids at the end.
+
+    The searched columns also get a lowercase key column, computed once as
+    rows are added, and every column can give a permutation of the live row
+    ids sorted by it, built on first use and then patched by refreshes. So
+    searching and sorting never lowercase or re-sort the catalog per query.
+    """
+
+    COLUMNS = ("item_code", "description", "uom", "unit_price", "unit_cost", "barcode", "location", "location_price")
+    KEY_COLUMNS = ("item_code", "description", "barcode")
+    PRICE_COLUMNS = ("unit_price", "unit_cost", "location_price")
+
+    def __init__(self, source="sqlserver"):
+        self.source = source  # CatalogAdapter the rows were converted by
+        self.item_code = []
+        self.description = []
+        self.uom = []
+        self.unit_price = array('d')
+        self.unit_cost = array('d')
+        self.barcode = []
+        self.location = []
+        self.location_price = array('d')
+        self.item_code_keys = []
+        self.description_keys = []
+        self.barcode_keys = []
+        self.alive = bytearray()
+        self.order = []  # Live row ids sorted by lowercase barcode
+        self.live_count = 0
+        self.version = 0  # Bumped on every change so caches can tell the catalog moved on
+        self._permutations = {}  # Column -> live row ids sorted by it, besides the barcode order
+        self._strings = {}
+
+    def __len__(self):
+        return self.live_count
+
+    def _intern(self, value):
+        # Few distinct UOM and location values exist, so share a single string object for each
+        return self._strings.setdefault(value, value)
+
+    @staticmethod
+    def _price(value):
+        return math.nan if value is None else float(value)
+
+    @staticmethod
+    def _nullable(value):
+        return None if math.isnan(value) else value
+
+    @staticmethod
+    def _key(value):
+        key = str(value).lower()
+        return value if key == value else key  # Already lowercase: share the value's string
+
+    def append(self, item_code, description, uom, unit_price, unit_cost, barcode, location, location_price):
+        """Add one row and return its row id. Call sort() once all rows are added."""
+        row_id = len(self.alive)
+        self.item_code.append(item_code)
+        self.description.append(description)
+        self.uom.append(self._intern(uom))
+        self.unit_price.append(self._price(unit_price))
+        self.unit_cost.append(self._price(unit_cost))
+        self.barcode.append(barcode)
+        self.location.append(self._intern(location))
+        self.location_price.append(self._price(location_price))
+        self.item_code_keys.append(self._key(item_code))
+        self.description_keys.append(self._key(description))
+        self.barcode_keys.append(self._key(barcode))
+        self.alive.append(1)
+        self.live_count += 1
+        return row_id
+
+    def extend(self, rows):
+        """Add rows in COLUMNS order and return their row ids."""
+        return [self.append(*row) for row in rows]
+
+    def barcode_key(self, row_id):
+        return self.barcode_keys[row_id]
+
+    def key_column(self, column):
+        """Return the lowercase keys of one of KEY_COLUMNS, indexed by row id."""
+        return getattr(self, f"{column}_keys")
+
+    def sort_key(self, column):
+        """Return a function giving the sort key of a row id for column; NULL prices sort last."""
+        if column in self.KEY_COLUMNS:
+            return self.key_column(column).__getitem__
+        values = getattr(self, column)
+        if column in self.PRICE_COLUMNS:
+            # NaN compares unequal to itself, so NULL prices all get the same key
+            return lambda row_id: (True, 0.0) if math.isnan(values[row_id]) else (False, values[row_id])
+        return lambda row_id: str(values[row_id]).lower()
+
+    def permutation(self, column):
+        """
+        Return the live row ids sorted by column.
+
+        The barcode permutation is ids(); others are built on first use and kept
+        up to date by replace_item_codes. Shared, do not modify it.
+        """
+        if column == "barcode":
+            return self.ids()
+        permutation = self._permutations.get(column)
+        if permutation is None:
+            # Sorting the barcode order is stable, so equal keys stay in barcode order
+            permutation = array('I', sorted(self.ids(), key=self.sort_key(column)))
+            self._permutations[column] = permutation
+        return permutation
+
+    def sort(self, order=None):
+        """
+        Rebuild the barcode order over all live rows.
+
+        order may pass the live row ids already arranged in sorted runs (e.g. the
+        sorted fetch batches), which the sort then only has to merge.
+        """
+        if order is None:
+            order = [row_id for row_id in range(len(self.alive)) if self.alive[row_id]]
+        order.sort(key=self.barcode_keys.__getitem__)
+        self.order = order
+        self._permutations = {}
+        self.version += 1
+
+    def ids(self):
+        """Return live row ids in barcode order. The list is shared, do not modify it."""
+        return self.order
+
+    def record(self, row_id):
+        """Return the row as a tuple in COLUMNS order, with NULL prices as None."""
+        return (
+            self.item_code[row_id],
+            self.description[row_id],
+            self.uom[row_id],
+            self._nullable(self.unit_price[row_id]),
+            self._nullable(self.unit_cost[row_id]),
+            self.barcode[row_id],
+            self.location[row_id],
+            self._nullable(self.location_price[row_id]),
+        )
+
+    def records(self):
+        """Yield live rows in barcode order, e.g. to write them to the replica."""
+        for row_id in self.order:
+            yield self.record(row_id)
+
+    def apply_location_prices(self, location, prices):
+        """
+        Re-join the location and location price columns for another location.
+
+        prices maps (item code, UOM) to that location's price plan price. Like
+        the LEFT JOIN in the catalog query, items without a plan fall back to
+        'HQ' and their unit price.
+        """
+        location = self._intern(location)
+        default_location = self._intern('HQ')
+        for row_id, key in enumerate(zip(self.item_code, self.uom)):
+            if key in prices:
+                price = prices[key]
+                self.location[row_id] = location
+                self.location_price[row_id] = self.unit_price[row_id] if price is None else float(price)
+            else:
+                self.location[row_id] = default_location
+                self.location_price[row_id] = self.unit_price[row_id]
+        self._permutations.pop("location", None)
+        self._permutations.pop("location_price", None)
+        self.version += 1
+
+    def replace_item_codes(self, item_codes, rows):
+        """
+        Replace all rows of the given item codes with new rows.
+
+        Used by the delta refresh: the old rows are marked dead and the new rows
+        are inserted into the barcode order and the built permutations without a
+        full resort. Returns the removed and the added row ids, so indexes can be
+        patched the same way.
+        """
+        changed = set(item_codes)
+        removed = []
+        for row_id, item_code in enumerate(self.item_code):
+            if self.alive[row_id] and item_code in changed:
+                self.alive[row_id] = 0
+                removed.append(row_id)
+        self.live_count -= len(removed)
+
+        if removed:
+            self.order = [row_id for row_id in self.order if self.alive[row_id]]
+            for column, permutation in list(self._permutations.items()):
+                self._permutations[column] = array('I', (row_id for row_id in permutation if self.alive[row_id]))
+        added = self.extend(rows)
+        for row_id in added:
+            insort(self.order, row_id, key=self.barcode_key)
+        for column, permutation in self._permutations.items():
+            key = self.sort_key(column)
+            for row_id in added:
+                insort(permutation, row_id, key=key)
+        self.version += 1
+        return removed, added
@@ -161,6 +161,13 @@ class BarcodeConfig(QObject):
         self.settings.setValue("itemCount", item_count)
         self.setting_changed.emit("itemCount", item_count)
 
+    def get_fetch_batch_size(self):
+        return self.settings.value("fetchBatchSize", 2000, type=int)
+
+    def set_fetch_batch_size(self, fetch_batch_size):
+        self.settings.setValue("fetchBatchSize", fetch_batch_size)
+        self.setting_changed.emit("fetchBatchSize", fetch_batch_size)
+
     def get_enter_to_search(self):
         return self.settings.value("enterToSearch", True, type=bool)
 
@@ -228,6 +235,69 @@ class BarcodeConfig(QObject):
     def set_sqlitePath(self, path:str):
         self.settings.setValue("sqlPath", path)
     
+    def get_use_replica(self):
+        return self.settings.value("useReplica", True, type=bool)
+
+    def set_use_replica(self, use_replica):
+        self.settings.setValue("useReplica", use_replica)
+        self.setting_changed.emit("useReplica", use_replica)
+
+    def get_replica_path(self):
+        return self.settings.value("replicaPath", "C:/barcode", type=str)
+
+    def set_replica_path(self, replica_path):
+        self.settings.setValue("replicaPath", replica_path)
+        self.setting_changed.emit("replicaPath", replica_path)
+
+    def get_delta_refresh_interval(self):
+        return self.settings.value("deltaRefreshInterval", 60, type=int)
+
+    def set_delta_refresh_interval(self, delta_refresh_interval):
+        self.settings.setValue("deltaRefreshInterval", delta_refresh_interval)
+        self.setting_changed.emit("deltaRefreshInterval", delta_refresh_interval)
+
+    def get_pool_max_size(self):
+        return self.settings.value("poolMaxSize", 4, type=int)
+
+    def set_pool_max_size(self, pool_max_size):
+        self.settings.setValue("poolMaxSize", pool_max_size)
+        self.setting_changed.emit("poolMaxSize", pool_max_size)
+
+    def get_pool_idle_timeout(self):
+        return self.settings.value("poolIdleTimeout", 300, type=int)
+
+    def set_pool_idle_timeout(self, pool_idle_timeout):
+        self.settings.setValue("poolIdleTimeout", pool_idle_timeout)
+        self.setting_changed.emit("poolIdleTimeout", pool_idle_timeout)
+
+    def get_pushdown_threshold(self):
+        return self.settings.value("pushdownThreshold", 1000000, type=int)
+
+    def set_pushdown_threshold(self, pushdown_threshold):
+        self.settings.setValue("pushdownThreshold", pushdown_threshold)
+        self.setting_changed.emit("pushdownThreshold", pushdown_threshold)
+
+    def get_use_snapshot(self):
+        return self.settings.value("useSnapshot", True, type=bool)
+
+    def set_use_snapshot(self, use_snapshot):
+        self.settings.setValue("useSnapshot", use_snapshot)
+        self.setting_changed.emit("useSnapshot", use_snapshot)
+
+    def get_use_full_text_search(self):
+        return self.settings.value("useFullTextSearch", True, type=bool)
+
+    def set_use_full_text_search(self, use_full_text_search):
+        self.settings.setValue("useFullTextSearch", use_full_text_search)
+        self.setting_changed.emit("useFullTextSearch", use_full_text_search)
+
+    def get_sharded_search_threshold(self):
+        return self.settings.value("shardedSearchThreshold", 500000, type=int)
+
+    def set_sharded_search_threshold(self, sharded_search_threshold):
+        self.settings.setValue("shardedSearchThreshold", sharded_search_threshold)
+        self.setting_changed.emit("shardedSearchThreshold", sharded_search_threshold)
+
     def reset_to_defaults(self):
         """Reset all settings to their default values."""
         # defaults = {
@@ -0,0 +1,194 @@
+import threading
+import time
+from contextlib import contextmanager
+import pyodbc
+from modules.logger_config import setup_logger
+
+
+def build_connection_string(server, database, username, password, trusted_connection=False):
+    """Build the SQL Server ODBC connection string used across the application."""
+    connection_string = (
+        f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+        f'SERVER={server};'
+        f'DATABASE={database};'
+        f'UID={username};'
+        f'PWD={password};'
+    )
+    if trusted_connection:
+        connection_string += 'Trusted_Connection=yes;'
+    return connection_string
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pyodbc connections to one SQL Server database.
+
+    connection() is a per-thread checkout: nested uses on the same thread get
+    the same connection, and it goes back to the pool when the outermost block
+    exits. acquire()/release() check a connection out explicitly, for owners
+    such as CatalogQuery that keep one across threads and refreshes.
+
+    Connections idle for longer than health_check_after seconds are tested with
+    SELECT 1 before being handed out, those idle longer than idle_timeout are
+    closed, and at most max_size connections exist at once.
+    """
+
+    def __init__(self, connection_string, max_size=4, idle_timeout=300, health_check_after=30, connect_timeout=5):
+        self.logger = setup_logger("ConnectionPool")
+        self.connection_string = connection_string
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.connect_timeout = connect_timeout
+        self._condition = threading.Condition()
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._size = 0  # Connections currently open, idle or checked out
+        self._local = threading.local()
+        self._closed = False
+
+    def _open(self):
+        self.logger.info("Opening new pooled SQL Server connection...")
+        return pyodbc.connect(self.connection_string, timeout=self.connect_timeout, autocommit=True)
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except pyodbc.Error as e:
+            self.logger.warning(f"Error closing pooled connection: {e}")
+
+    def _is_healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1;")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except pyodbc.Error as e:
+            self.logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        keep = []
+        for connection, returned_at in self._idle:
+            if now - returned_at > self.idle_timeout:
+                self._close_quietly(connection)
+                self._size -= 1
+            else:
+                keep.append((connection, returned_at))
+        if len(keep) != len(self._idle):
+            self.logger.debug(f"Evicted {len(self._idle) - len(keep)} idle connections.")
+            self._idle = keep
+            self._condition.notify_all()
+
+    def acquire(self, timeout=None):
+        """
+        Check a connection out of the pool, opening one if below max_size.
+
+        Blocks until a connection is free, raising pyodbc.Error after timeout seconds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise pyodbc.Error("Connection pool is closed")
+                self._evict_idle_locked()
+
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                    needs_check = time.monotonic() - returned_at > self.health_check_after
+                elif self._size < self.max_size:
+                    self._size += 1  # Reserve the slot, then connect outside the lock
+                    connection, needs_check = None, False
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise pyodbc.Error(f"No pooled connection became free within {timeout} seconds")
+                    self._condition.wait(remaining)
+                    continue
+
+            if connection is None:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+
+            if needs_check and not self._is_healthy(connection):
+                self._close_quietly(connection)
+                with self._condition:
+                    self._size -= 1
+                continue
+            return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it when discard is set or the pool is closed."""
+        with self._condition:
+            if discard or self._closed:
+                self._close_quietly(connection)
+                self._size -= 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+                self._evict_idle_locked()
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Per-thread checkout: nested blocks on one thread share a single connection."""
+        local = self._local
+        if getattr(local, "connection", None) is not None:
+            local.depth += 1
+            try:
+                yield local.connection
+            finally:
+                local.depth -= 1
+            return
+
+        connection = self.acquire(timeout)
+        local.connection = connection
+        local.depth = 1
+        broken = False
+        try:
+            yield connection
+        except pyodbc.Error:
+            broken = True
+            raise
+        finally:
+            local.depth -= 1
+            local.connection = None
+            self.release(connection, discard=broken)
+
+    def close_all(self):
+        """Close idle connections and stop handing out new ones; checked out ones close on release."""
+        with self._condition:
+            self._closed = True
+            for connection, _ in self._idle:
+                self._close_quietly(connection)
+                self._size -= 1
+            self._idle = []
+            self._condition.notify_all()
+        self.logger.info("Connection pool closed.")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connection_string, max_size=4, idle_timeout=300):
+    """Return the shared pool for a connection string, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(connection_string)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(connection_string, max_size=max_size, idle_timeout=idle_timeout)
+            _pools[connection_string] = pool
+        return pool
+
+
+def close_pool(connection_string):
+    """Close and forget the shared pool for a connection string, e.g. after the settings changed."""
+    with _pools_lock:
+        pool = _pools.pop(connection_string, None)
+    if pool is not None:
+        pool.close_all()
@@ -0,0 +1,88 @@
+from itertools import islice
+
+
+class DisplayRowCache:
+    """
+    Formatted table text of catalog rows, keyed by row id.
+
+    Formatting a row (three "RM x.xx" prices, the hidden cost, the barcode
+    fallback) is done once, mostly by a worker formatting the rows ahead of
+    the table, so painting a cell is a dict lookup. Rows the worker has not
+    reached yet are formatted on first paint.
+
+    A row's text only depends on the catalog, its location prices and the
+    hideCost setting: reset() drops everything when the catalog or hideCost
+    changes, invalidate() after prices are re-joined. Each of those bumps the
+    stamp, so rows a worker formatted before are refused by fill().
+    """
+
+    def __init__(self, capacity=200000):
+        self.capacity = capacity
+        self.catalog = None
+        self.hide_cost = False
+        self.stamp = 0
+        self.rows = {}  # Row id -> column texts, Item Code to Price
+
+    def __len__(self):
+        return len(self.rows)
+
+    @staticmethod
+    def format_price(value):
+        return f"RM {float(value):.2f}" if value is not None else "RM 0.00"
+
+    @classmethod
+    def format_row(cls, catalog, row_id, hide_cost):
+        """Return the text of the catalog columns of the item table, Item Code to Price, for a row id."""
+        # (item_code, description, uom, unit_price, unit_cost, barcode, location, location_price)
+        item_code, description, uom, unit_price, unit_cost, barcode, location, location_price = catalog.record(row_id)
+        return (
+            str(item_code),
+            str(description),
+            str(uom),
+            cls.format_price(unit_price),
+            '***' if hide_cost else cls.format_price(unit_cost),
+            str(item_code if barcode is None else barcode),
+            str(location),
+            cls.format_price(location_price),
+        )
+
+    def reset(self, catalog, hide_cost):
+        """Start formatting rows of catalog with hide_cost; keeps the rows when neither changed."""
+        if catalog is not self.catalog or hide_cost != self.hide_cost:
+            self.catalog = catalog
+            self.hide_cost = hide_cost
+            self.invalidate()
+
+    def invalidate(self):
+        self.rows = {}
+        self.stamp += 1
+
+    def row(self, row_id):
+        text = self.rows.get(row_id)
+        if text is None:
+            text = self.format_row(self.catalog, row_id, self.hide_cost)
+            self._store(row_id, text)
+        return text
+
+    def missing(self, row_ids):
+        """Return the row ids that have no formatted text yet."""
+        return [row_id for row_id in row_ids if row_id not in self.rows]
+
+    def fill(self, stamp, rows):
+        """Add rows formatted by a worker since stamp; they are dropped if the cache was invalidated since."""
+        if stamp != self.stamp:
+            return
+        for row_id, text in rows.items():
+            self.rows.setdefault(row_id, text)
+        self._trim()
+
+    def _store(self, row_id, text):
+        self.rows[row_id] = text
+        self._trim()
+
+    def _trim(self):
+        # Rows are dropped oldest first; the ones on screen were added last
+        excess = len(self.rows) - self.capacity
+        if excess > 0:
+            for row_id in list(islice(self.rows, excess)):
+                del self.rows[row_id]
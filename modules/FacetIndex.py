@@ -0,0 +1,119 @@
+import math
+from bisect import bisect_right
+
+
+class FacetIndex:
+    """
+    Bitmap index of the live rows by UOM, location and location price bucket.
+
+    Each facet value maps to a Python int used as a bitset, with bit row_id
+    set for every row having that value. A combination of facets is then a
+    few big-int ORs and ANDs, which run at C speed over the whole catalog,
+    and text search results are filtered by testing one bit per row.
+
+    Prices fall into the buckets between PRICE_EDGES; rows without a price
+    are in no bucket.
+    """
+
+    FACETS = ("uom", "location", "price")
+    PRICE_EDGES = (1, 5, 10, 20, 50, 100)
+
+    def __init__(self):
+        self.bitmaps = {facet: {} for facet in self.FACETS}
+
+    @classmethod
+    def price_bucket(cls, price):
+        return None if math.isnan(price) else bisect_right(cls.PRICE_EDGES, price)
+
+    @classmethod
+    def bucket_range(cls, bucket):
+        """Return the (low, high) price bounds of a bucket; None stands for unbounded."""
+        low = cls.PRICE_EDGES[bucket - 1] if bucket > 0 else None
+        high = cls.PRICE_EDGES[bucket] if bucket < len(cls.PRICE_EDGES) else None
+        return low, high
+
+    @staticmethod
+    def _values(catalog, facet):
+        if facet == "price":
+            prices = catalog.location_price
+            return lambda row_id: FacetIndex.price_bucket(prices[row_id])
+        return getattr(catalog, facet).__getitem__
+
+    def _build_facet(self, catalog, facet):
+        # Set bits in one bytearray per value, then turn each into an int once
+        size = (len(catalog.barcode) + 7) // 8  # Every row id, dead ones included
+        value_of = self._values(catalog, facet)
+        bits = {}
+        for row_id in catalog.ids():
+            value = value_of(row_id)
+            if value is None:
+                continue
+            array = bits.get(value)
+            if array is None:
+                array = bits[value] = bytearray(size)
+            array[row_id >> 3] |= 1 << (row_id & 7)
+        self.bitmaps[facet] = {value: int.from_bytes(array, "little") for value, array in bits.items()}
+
+    def build(self, catalog, cancelled=None):
+        """Index every live row; cancelled is polled between facets to abandon the build."""
+        for facet in self.FACETS:
+            if cancelled is not None and cancelled():
+                return None
+            self._build_facet(catalog, facet)
+        return self
+
+    def refresh_prices(self, catalog):
+        """Rebuild the facets that CatalogStore.apply_location_prices changes."""
+        self._build_facet(catalog, "location")
+        self._build_facet(catalog, "price")
+
+    def update(self, catalog, removed_row_ids, added_row_ids):
+        """Apply the row ids returned by CatalogStore.replace_item_codes."""
+        removed = 0
+        for row_id in removed_row_ids:
+            removed |= 1 << row_id
+        for facet in self.FACETS:
+            bitmaps = self.bitmaps[facet]
+            if removed:
+                for value in list(bitmaps):
+                    bitmaps[value] &= ~removed
+            value_of = self._values(catalog, facet)
+            for row_id in added_row_ids:
+                value = value_of(row_id)
+                if value is not None:
+                    bitmaps[value] = bitmaps.get(value, 0) | 1 << row_id
+
+    def values(self, facet):
+        """Return the values of a facet that some live row has, sorted."""
+        return sorted(value for value, bitmap in self.bitmaps[facet].items() if bitmap)
+
+    def mask(self, uom=None, location=None, price=None):
+        """
+        Return the bitmap of rows matching every given facet, or None when none is given.
+
+        price is a (low, high) range, either bound None for unbounded; it
+        selects the buckets lying inside it, so its bounds should be PRICE_EDGES.
+        """
+        mask = None
+        if uom is not None:
+            mask = self.bitmaps["uom"].get(uom, 0)
+        if location is not None:
+            bitmap = self.bitmaps["location"].get(location, 0)
+            mask = bitmap if mask is None else mask & bitmap
+        if price is not None:
+            low, high = price
+            bitmap = 0
+            for bucket, bucket_bitmap in self.bitmaps["price"].items():
+                bucket_low, bucket_high = self.bucket_range(bucket)
+                if ((low is None or (bucket_low is not None and bucket_low >= low))
+                        and (high is None or (bucket_high is not None and bucket_high <= high))):
+                    bitmap |= bucket_bitmap
+            mask = bitmap if mask is None else mask & bitmap
+        return mask
+
+    @staticmethod
+    def filter(row_ids, mask):
+        """Return the row ids whose bit is set in mask, keeping their order."""
+        bits = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        size = len(bits)
+        return [row_id for row_id in row_ids if row_id >> 3 < size and bits[row_id >> 3] >> (row_id & 7) & 1]
@@ -0,0 +1,142 @@
+import time
+
+
+class FuzzyIndex:
+    """
+    SymSpell-style deletion dictionary for typo-tolerant lookups of the terms
+    of one catalog column.
+
+    Every term is stored under each variant that deletes up to max_distance
+    characters from its first prefix_length characters. A misspelt word
+    shares a delete variant with every term within that edit distance, so a
+    lookup only generates the word's own deletes and verifies the few terms
+    found under them, instead of comparing against the whole vocabulary.
+
+    With tokens set the terms are the whitespace tokens of the column's
+    lowercase keys (for descriptions), otherwise the whole keys (for codes).
+    """
+
+    def __init__(self, column, tokens=True, max_distance=2, prefix_length=7):
+        self.column = column
+        self.tokens = tokens
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = {}  # Term -> number of rows it occurs in
+        self.deletes = {}  # Delete variant -> terms
+
+    def _terms_of(self, key):
+        return set(key.split()) if self.tokens else {key}
+
+    def _variants(self, word, max_distance):
+        """Return word and every string made by deleting up to max_distance characters from its prefix."""
+        variants = {word}
+        edge = {word}
+        for _ in range(max_distance):
+            next_edge = set()
+            for variant in edge:
+                if len(variant) > 1:
+                    for i in range(len(variant)):
+                        next_edge.add(variant[:i] + variant[i + 1:])
+            next_edge -= variants
+            variants |= next_edge
+            edge = next_edge
+        return variants
+
+    def add_term(self, term, count=1):
+        if term in self.terms:
+            self.terms[term] += count
+            return
+        self.terms[term] = count
+        for variant in self._variants(term[:self.prefix_length], self.max_distance):
+            entry = self.deletes.get(variant)
+            if entry is None:
+                self.deletes[variant] = [term]
+            else:
+                entry.append(term)
+
+    def build(self, catalog, cancelled=None):
+        """Index the terms of every live row; cancelled is polled now and then to abandon the build."""
+        counts = {}
+        keys = catalog.key_column(self.column)
+        for row_id in catalog.ids():
+            for term in self._terms_of(keys[row_id]):
+                counts[term] = counts.get(term, 0) + 1
+        for number, (term, count) in enumerate(counts.items()):
+            if cancelled is not None and number % 1000 == 0 and cancelled():
+                return None
+            self.add_term(term, count)
+        return self
+
+    def update(self, catalog, removed_row_ids, added_row_ids):
+        """Add the terms of rows added by a refresh; terms of removed rows simply stop matching rows."""
+        keys = catalog.key_column(self.column)
+        for row_id in added_row_ids:
+            for term in self._terms_of(keys[row_id]):
+                self.add_term(term)
+
+    @staticmethod
+    def distance(a, b, max_distance):
+        """Optimal string alignment distance between a and b, or None when it exceeds max_distance."""
+        if abs(len(a) - len(b)) > max_distance:
+            return None
+        # Codes and words often share long prefixes or suffixes, which cost nothing
+        start = 0
+        while start < len(a) and start < len(b) and a[start] == b[start]:
+            start += 1
+        end_a, end_b = len(a), len(b)
+        while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+            end_a -= 1
+            end_b -= 1
+        a, b = a[start:end_a], b[start:end_b]
+        if not a or not b:
+            return len(a) + len(b)
+
+        # Only cells within max_distance of the diagonal can stay within max_distance
+        too_far = max_distance + 1
+        previous_previous = None
+        previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+        for i in range(1, len(a) + 1):
+            current = [too_far] * (len(b) + 1)
+            current[0] = i if i <= max_distance else too_far
+            row_minimum = current[0]
+            for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+                if a[i - 1] == b[j - 1]:
+                    value = previous[j - 1]
+                else:
+                    value = 1 + min(previous[j], current[j - 1], previous[j - 1])
+                    if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                        value = min(value, previous_previous[j - 2] + 1)  # Transposition
+                current[j] = value
+                if value < row_minimum:
+                    row_minimum = value
+            if row_minimum > max_distance:
+                return None
+            previous_previous, previous = previous, current
+        return previous[-1] if previous[-1] <= max_distance else None
+
+    def allowed_distance(self, word):
+        # Short words allow fewer typos, otherwise almost anything would match them
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 4:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, word, limit=10, deadline=None):
+        """
+        Return up to limit (distance, term) pairs for the terms closest to word,
+        nearest and most frequent first. Stops early once deadline
+        (a time.perf_counter() value) has passed, keeping what was found.
+        """
+        word = word.lower()
+        max_distance = self.allowed_distance(word)
+        found = {}
+        for variant in self._variants(word[:self.prefix_length], max_distance):
+            for term in self.deletes.get(variant, ()):
+                if term not in found:
+                    found[term] = self.distance(word, term, max_distance)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        matches = [(distance, term) for term, distance in found.items() if distance is not None]
+        matches.sort(key=lambda match: (match[0], -self.terms[match[1]], match[1]))
+        return matches[:limit]
@@ -0,0 +1,174 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor
+from modules.DisplayRowCache import DisplayRowCache
+from modules.SelectionBasket import SelectionBasket
+
+
+class ItemTableModel(QAbstractTableModel):
+    """
+    Table model showing catalog rows, given by row id, straight from the catalog.
+
+    The model keeps only the catalog and the list of row ids: cell text is
+    looked up in a DisplayRowCache as the view paints it, so showing a new
+    result is a model reset instead of building an item per cell, and memory
+    does not grow with the number of rows. Rows are handed to the view
+    page_size at a time through canFetchMore()/fetchMore(), which the view
+    calls as it is scrolled towards the end, so every row of a result can be
+    reached. rows_loaded tells which rows were handed over, so their text
+    can be formatted ahead in the background.
+
+    Sorted results come in ascending order; with reversed set the rows are
+    shown from the end, so changing the sort direction costs nothing.
+
+    The check and copies columns are the only editable ones. They show and
+    change a SelectionBasket, not the rows shown, so picks survive new
+    results; setting copies picks the row too.
+    """
+
+    HEADERS = ["*", "Item Code", "Description", "UOM", "Unit Price", "Unit Cost", "Barcode", "Location", "Price", "Copies"]
+    CHECK_COLUMN = 0
+    COPIES_COLUMN = 9
+    # Column -> catalog column it can be sorted by; not the cost, which would reveal it when hidden
+    SORT_COLUMNS = {1: "item_code", 2: "description", 3: "uom", 4: "unit_price", 6: "barcode", 7: "location", 8: "location_price"}
+
+    rows_loaded = pyqtSignal(int, int)  # First and end position of rows handed to the view
+    selection_changed = pyqtSignal()  # A row was put in or taken out of the basket, or its copies changed
+
+    def __init__(self, parent=None, page_size=100, cache=None, basket=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.cache = cache if cache is not None else DisplayRowCache()
+        self.basket = basket if basket is not None else SelectionBasket()
+        self.catalog = None
+        self.row_ids = []
+        self.loaded = 0  # Rows handed to the view so far
+        self.reversed = False
+        self.stripe = QBrush(QColor(230, 238, 255))  # Shared by every even row
+
+    def set_rows(self, catalog, row_ids, hide_cost=False, reverse=False):
+        """Show row_ids of catalog, from the end with reverse, instead of the current rows; row_ids is kept, not copied."""
+        self.beginResetModel()
+        self.catalog = catalog
+        self.row_ids = row_ids
+        self.reversed = reverse
+        self.loaded = min(len(row_ids), max(1, self.page_size))
+        self.cache.reset(catalog, hide_cost)
+        self.endResetModel()
+        self.rows_loaded.emit(0, self.loaded)
+
+    def set_reversed(self, reverse):
+        """Show the same rows in the opposite order, from the first page."""
+        if reverse == self.reversed:
+            return
+        self.beginResetModel()
+        self.reversed = reverse
+        self.loaded = min(len(self.row_ids), max(1, self.page_size))
+        self.endResetModel()
+        self.rows_loaded.emit(0, self.loaded)
+
+    def row_id_at(self, row):
+        return self.row_ids[-1 - row] if self.reversed else self.row_ids[row]
+
+    def row_ids_between(self, first, end):
+        """Return the row ids shown at rows first to end, end excluded."""
+        return [self.row_id_at(row) for row in range(first, min(end, len(self.row_ids)))]
+
+    def refresh(self):
+        """Repaint the rows shown, e.g. after the catalog's prices changed in place."""
+        self.cache.invalidate()
+        self.rows_loaded.emit(0, self.loaded)
+        self.repaint()
+
+    def repaint(self):
+        if self.loaded:
+            self.dataChanged.emit(self.index(0, 0), self.index(self.loaded - 1, len(self.HEADERS) - 1))
+
+    def replace_catalog(self, catalog):
+        """Read the rows shown from catalog, a copy of the current one with the same row ids."""
+        self.catalog = catalog
+        self.cache.reset(catalog, self.cache.hide_cost)
+        self.refresh()
+
+    def set_hide_cost(self, hide_cost):
+        if hide_cost != self.cache.hide_cost:
+            self.cache.reset(self.catalog, hide_cost)
+            self.refresh()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.row_ids)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(len(self.row_ids) - self.loaded, max(1, self.page_size))
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+        self.rows_loaded.emit(self.loaded - count, self.loaded)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        row, column = index.row(), index.column()
+        row_id = self.row_id_at(row)
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            if column == self.CHECK_COLUMN:
+                return None
+            if column == self.COPIES_COLUMN:
+                return str(self.basket.get(self.catalog, row_id) or 1)
+            return self.cache.row(row_id)[column - 1]
+        if role == Qt.CheckStateRole and column == self.CHECK_COLUMN:
+            return Qt.Unchecked if self.basket.get(self.catalog, row_id) is None else Qt.Checked
+        if role == Qt.BackgroundRole and row % 2 == 0:
+            return self.stripe
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignLeft | Qt.AlignVCenter if column == self.CHECK_COLUMN else Qt.AlignCenter
+        if role == Qt.UserRole:
+            return row_id
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        if index.column() == self.CHECK_COLUMN:
+            return Qt.ItemIsUserCheckable | Qt.ItemIsEnabled
+        if index.column() == self.COPIES_COLUMN:
+            return Qt.ItemIsEditable | Qt.ItemIsEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return False
+        row_id = self.row_id_at(index.row())
+        if role == Qt.CheckStateRole and index.column() == self.CHECK_COLUMN:
+            if value == Qt.Checked:
+                self.basket.set(self.catalog, row_id)
+            else:
+                self.basket.remove(self.catalog, row_id)
+        elif role == Qt.EditRole and index.column() == self.COPIES_COLUMN:
+            try:
+                copies = int(str(value).strip())
+            except ValueError:
+                return False
+            if copies < 1:
+                return False
+            self.basket.set(self.catalog, row_id, copies)
+        else:
+            return False
+        # Both the check and the copies cell of the row may have changed
+        self.dataChanged.emit(self.index(index.row(), self.CHECK_COLUMN), self.index(index.row(), self.COPIES_COLUMN))
+        self.selection_changed.emit()
+        return True
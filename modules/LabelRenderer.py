@@ -0,0 +1,68 @@
+import re
+
+
+class LabelRenderer:
+    """
+    Turns catalog rows into label printer commands with the configured template.
+
+    The template, label language and company name are read from the settings
+    once per print job, so rendering a row is a placeholder substitution
+    that can run on a worker thread. Labels are preceded by the clear
+    command of their language where the transport asks for it (see
+    LabelTransport.send_clear).
+    """
+
+    PLACEHOLDER = re.compile(r'{{(.*?)}}')
+
+    def __init__(self, template, use_zpl, company_name, remark=""):
+        self.template = template or ""
+        self.use_zpl = use_zpl
+        self.company_name = company_name
+        self.remark = remark
+        self.clear = "^XA^CLS^XZ" if use_zpl else "CLS"
+        self.missing = set()  # Placeholders of the template that no value was given for
+
+    @classmethod
+    def from_config(cls, config, size_options, remark=""):
+        """Read the template of the selected label language and size; size_options are the size names, smallest first."""
+        use_zpl = config.get_use_zpl()
+        if use_zpl:
+            size = config.get_zplSize()
+            templates = (config.get_zpl_template(), config.get_zpl_size80_template(), config.get_zpl_size3_template())
+        else:
+            size = config.get_tpslSize()
+            templates = (config.get_tpsl_template(), config.get_tpsl_size80_template(), config.get_tpsl_size3_template())
+        template = templates[size_options.index(size)] if size in size_options else templates[0]
+        return cls(template, use_zpl, config.get_company_name(), remark)
+
+    @classmethod
+    def replace_placeholders(cls, template, values, missing=None):
+        """Replace every {{name}} in template by values[name]; unknown names are left as they are and added to missing."""
+        def replace(match):
+            key = match.group(1)
+            if key not in values:
+                if missing is not None:
+                    missing.add(key)
+                return match.group(0)
+            return str(values[key])
+        return cls.PLACEHOLDER.sub(replace, template)
+
+    def render(self, record, copies):
+        """Return the label of a catalog record, a tuple in CatalogStore.COLUMNS order, without the clear command."""
+        item_code, description, _, _, _, barcode, _, location_price = record
+        data = self.replace_placeholders(self.template, {
+            "companyName": self.company_name,
+            "description": str(description).replace('"', ''),
+            "remark": self.remark,
+            "barcode_value": str(item_code if barcode is None else barcode),
+            "unit_price_integer": f"RM {float(location_price):.2f}" if location_price is not None else "RM 0.00",
+            "copies": copies,
+        }, self.missing)
+        if self.use_zpl and self.remark:
+            data += f"\n^FO10,180^A0N,15,20^FDRemark: {self.remark}^FS"
+        return data
+
+    def command(self, record, copies, clear=True):
+        """Return the label of a catalog record, ready to send, after the clear command unless clear is False."""
+        label = f"{self.render(record, copies)}\r\n"
+        return f"{self.clear}\r\n{label}" if clear else label
@@ -0,0 +1,107 @@
+import socket
+import usb.core
+import usb.util
+from win32 import win32print
+
+
+class LabelTransport:
+    """
+    One connection to the label printer for a whole print job.
+
+    The printer is reached the way the settings say: over USB with the
+    generic driver, over the network in wireless mode, or else through the
+    Windows spooler. open() connects once, send() writes any number of
+    labels and close() ends the job, so a job of thousands of labels does
+    not reconnect (or start a spooler job) per label.
+
+    Errors are raised, not shown, so a job can run on a worker thread.
+    """
+
+    USB = "usb"
+    WIRELESS = "wireless"
+    WIN32 = "win32"
+
+    def __init__(self, mode, vid=None, pid=None, endpoint=None, backend=None, address=None, printer_name=None, timeout=10):
+        self.mode = mode
+        self.vid = vid
+        self.pid = pid
+        self.endpoint = endpoint
+        self.backend = backend
+        self.address = address
+        self.printer_name = printer_name
+        self.timeout = timeout
+        self._device = None
+        self._socket = None
+        self._printer = None
+
+    @staticmethod
+    def _number(value):
+        # USB ids are stored as text such as "0x1234"
+        return value if isinstance(value, int) else int(str(value), 0)
+
+    @classmethod
+    def from_config(cls, config, backend=None):
+        """Build the transport for the printer in the settings; raises ValueError for a malformed address."""
+        if config.get_use_generic_driver():
+            return cls(cls.USB, vid=cls._number(config.get_vid()), pid=cls._number(config.get_pid()),
+                       endpoint=cls._number(config.get_endpoint()), backend=backend)
+        if config.get_wireless_mode():
+            ip_address, port = config.get_ip_address().split(":")
+            socket.inet_aton(ip_address)  # Raises OSError for an invalid address
+            return cls(cls.WIRELESS, address=(ip_address, int(port)))
+        return cls(cls.WIN32, printer_name=config.get_printer_name())
+
+    @property
+    def send_clear(self):
+        """Whether each label is preceded by the clear command; the generic USB driver sends labels alone."""
+        return self.mode != self.USB
+
+    def describe(self):
+        if self.mode == self.USB:
+            return f"USB printer {self.vid:#06x}:{self.pid:#06x}"
+        if self.mode == self.WIRELESS:
+            return f"{self.address[0]}:{self.address[1]}"
+        return f"printer '{self.printer_name}'"
+
+    def open(self):
+        if self.mode == self.USB:
+            device = usb.core.find(idVendor=self.vid, idProduct=self.pid, backend=self.backend)
+            if device is None:
+                raise ValueError("Printer not found. Check your device and USB permissions.")
+            device.set_configuration()
+            self._device = device
+        elif self.mode == self.WIRELESS:
+            self._socket = socket.create_connection(self.address, timeout=self.timeout)
+        else:
+            printer = win32print.OpenPrinter(self.printer_name)
+            try:
+                win32print.StartDocPrinter(printer, 1, ("Barcode labels", None, "RAW"))
+                win32print.StartPagePrinter(printer)
+            except Exception:
+                win32print.ClosePrinter(printer)
+                raise
+            self._printer = printer
+
+    def send(self, data):
+        encoded = data.encode('utf-8')
+        if self.mode == self.USB:
+            self._device.write(self.endpoint, encoded)
+        elif self.mode == self.WIRELESS:
+            self._socket.sendall(encoded)
+        else:
+            win32print.WritePrinter(self._printer, encoded)
+
+    def close(self):
+        if self._device is not None:
+            usb.util.dispose_resources(self._device)
+            self._device = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._printer is not None:
+            try:
+                win32print.EndPagePrinter(self._printer)
+                win32print.EndDocPrinter(self._printer)
+            finally:
+                win32print.ClosePrinter(self._printer)
+                self._printer = None
@@ -0,0 +1,66 @@
+import threading
+from modules.logger_config import setup_logger
+
+
+class LocationPriceCache:
+    """
+    PosPricePlan prices per location, loaded lazily and kept for the session.
+
+    The catalog is fetched once with the prices of the configured location.
+    Switching to another location only needs that location's price plan,
+    which CatalogStore.apply_location_prices joins onto the loaded items, so
+    printing labels for several branches in a row does not refetch the catalog.
+
+    Each cached overlay maps (ItemCode, UOM) to its price plan price, read
+    with the same join as the catalog query. Call clear() whenever the price
+    plan may have changed, e.g. after a delta refresh.
+    """
+
+    LOCATION_PRICES_SQL = """
+        SELECT u.ItemCode, u.UOM, p.Price
+        FROM dbo.ItemUOM u
+        JOIN dbo.PosPricePlan p ON u.ItemCode = p.ItemCode AND p.Location = ?
+        ORDER BY u.ItemCode, u.UOM, p.Price;
+    """
+
+    LOCATIONS_SQL = "SELECT DISTINCT Location FROM dbo.PosPricePlan WHERE Location IS NOT NULL ORDER BY Location;"
+
+    def __init__(self):
+        self.logger = setup_logger("LocationPriceCache")
+        self._lock = threading.Lock()
+        self._prices = {}
+        self.locations = None  # Distinct price plan locations, once loaded
+
+    def get(self, location):
+        """Return the cached overlay for a location, or None if it has not been loaded."""
+        with self._lock:
+            return self._prices.get(location)
+
+    def clear(self):
+        with self._lock:
+            self._prices.clear()
+
+    def load(self, connection, location):
+        """Read one location's price plan into the cache and return it."""
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.LOCATION_PRICES_SQL, (location,))
+            prices = {}
+            for item_code, uom, price in cursor.fetchall():
+                # An item with several plan rows keeps its lowest price, the first in this order, whatever order they come back in
+                prices.setdefault((item_code, uom), price)
+        finally:
+            cursor.close()
+        with self._lock:
+            self._prices[location] = prices
+        self.logger.info(f"Loaded {len(prices)} price plan entries for location {location}.")
+        return prices
+
+    def load_locations(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(self.LOCATIONS_SQL)
+            self.locations = [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+        return self.locations
@@ -0,0 +1,106 @@
+from array import array
+
+
+def is_cjk(character):
+    """True for Han, kana and Hangul characters, which are written without spaces between words."""
+    code = ord(character)
+    return (
+        0x3040 <= code <= 0x30FF  # Hiragana, Katakana
+        or 0x3400 <= code <= 0x4DBF  # CJK Extension A
+        or 0x4E00 <= code <= 0x9FFF  # CJK Unified Ideographs
+        or 0xAC00 <= code <= 0xD7AF  # Hangul syllables
+        or 0xF900 <= code <= 0xFAFF  # CJK Compatibility Ideographs
+        or 0x20000 <= code <= 0x2FA1F  # CJK Extensions B and later
+    )
+
+
+class NgramIndex:
+    """
+    Trigram index over one lowercase catalog column, with bigrams for CJK text.
+
+    Every trigram of a value, and every pair of adjacent CJK characters, maps
+    to a posting array of row ids. A keyword's grams must all appear in a row
+    that contains it, so intersecting their postings, smallest first, narrows
+    the catalog to a few candidates that are then verified with a substring
+    test. This finds matches in the middle of words and in scripts without
+    spaces, which the token index cannot narrow.
+
+    Keywords shorter than a trigram (and without a CJK bigram) have no grams;
+    they are only verified against the candidates of the other keywords.
+    """
+
+    def __init__(self, column="description"):
+        self.column = column
+        self.postings = {}
+        self.dead = set()
+
+    @staticmethod
+    def grams(text):
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        if not text.isascii():
+            cjk = [is_cjk(character) for character in text]
+            for i in range(len(text) - 1):
+                if cjk[i] and cjk[i + 1]:
+                    grams.add(text[i:i + 2])
+        return grams
+
+    def add(self, row_id, key):
+        for gram in self.grams(key):
+            postings = self.postings.get(gram)
+            if postings is None:
+                self.postings[gram] = array('I', (row_id,))
+            else:
+                postings.append(row_id)
+
+    def build(self, catalog, cancelled=None):
+        """Index every live row; cancelled is polled now and then to abandon the build early."""
+        keys = catalog.key_column(self.column)
+        for count, row_id in enumerate(catalog.ids()):
+            if cancelled is not None and count % 10000 == 0 and cancelled():
+                return None
+            self.add(row_id, keys[row_id])
+        return self
+
+    def update(self, catalog, removed_row_ids, added_row_ids):
+        """Apply the row ids returned by CatalogStore.replace_item_codes."""
+        self.dead.update(removed_row_ids)
+        keys = catalog.key_column(self.column)
+        for row_id in added_row_ids:
+            self.add(row_id, keys[row_id])
+
+    def search(self, catalog, keywords):
+        """
+        Return the set of live row ids whose value contains every keyword.
+
+        Returns None when no keyword is long enough to narrow the search, so
+        the caller can fall back to another index or a scan.
+        """
+        keywords = set(keywords)
+        grams = set()
+        for keyword in keywords:
+            grams |= self.grams(keyword)
+        if not grams:
+            return None
+
+        postings = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) * 8 < len(posting):
+                break  # Few candidates left: verifying them is cheaper than reading the long postings
+            candidates.intersection_update(posting)
+            if not candidates:
+                return candidates
+        candidates -= self.dead
+
+        keys = catalog.key_column(self.column)
+        return {
+            row_id for row_id in candidates
+            if all(keyword in keys[row_id] for keyword in keywords)
+        }
@@ -0,0 +1,128 @@
+import hashlib
+import os
+import sqlite3
+from modules.logger_config import setup_logger
+
+
+class PluSearchIndex:
+    """
+    SQLite FTS5 index over the names in a Tbl_Plu file.
+
+    The index lives in a companion file next to the replica rather than in the
+    PLU file itself, so the source can be read-only and programs writing to
+    Tbl_Plu never meet triggers that need FTS5. It is rebuilt whenever the
+    source file's mtime or size no longer match the ones it was built from.
+
+    search() matches every keyword as a word prefix and returns barcodes
+    ranked by bm25, best match first.
+    """
+
+    def __init__(self, db_path, directory="C:/barcode"):
+        self.logger = setup_logger("PluSearchIndex")
+        self.db_path = os.path.abspath(db_path)
+        self.directory = directory or "C:/barcode"
+        digest = hashlib.sha1(self.db_path.lower().encode("utf-8")).hexdigest()[:12]
+        self.path = os.path.join(self.directory, f"plu_fts_{digest}.db")
+        self.available = True  # Cleared when this SQLite build has no FTS5
+        self._checked = None  # Source fingerprint last confirmed to match the index
+
+    def _fingerprint(self):
+        stat = os.stat(self.db_path)
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def connect(self):
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, uri=True)  # uri allows attaching the source read-only
+        connection.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS plu_fts USING fts5(
+                name, barcode UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            );
+            CREATE TABLE IF NOT EXISTS source_state (
+                path TEXT PRIMARY KEY,
+                fingerprint TEXT
+            );
+        """)
+        return connection
+
+    def ensure(self):
+        """Rebuild the index if Tbl_Plu changed since it was built. Returns False when FTS5 cannot be used."""
+        if not self.available:
+            return False
+        try:
+            fingerprint = self._fingerprint()
+            if fingerprint == self._checked:
+                return True
+            connection = self.connect()
+            try:
+                row = connection.execute(
+                    "SELECT fingerprint FROM source_state WHERE path = ?", (self.db_path,)
+                ).fetchone()
+                if row is None or row[0] != fingerprint:
+                    self.rebuild(connection, fingerprint)
+            finally:
+                connection.close()
+            self._checked = fingerprint
+            return True
+        except sqlite3.OperationalError as e:
+            if "fts5" in str(e):
+                self.logger.warning(f"FTS5 is not available, falling back to scanning names: {e}")
+                self.available = False
+            else:
+                self.logger.error(f"Failed to update the PLU search index: {e}")
+            return False
+        except (OSError, sqlite3.Error) as e:
+            self.logger.error(f"Failed to update the PLU search index: {e}")
+            return False
+
+    def rebuild(self, connection, fingerprint):
+        self.logger.info(f"Building PLU search index for {self.db_path}...")
+        # Read the source through a read-only attachment, it is never written to
+        source_uri = "file:" + self.db_path.replace("\\", "/").replace("?", "%3f").replace("#", "%23") + "?mode=ro"
+        connection.execute("ATTACH DATABASE ? AS source", (source_uri,))
+        try:
+            with connection:
+                connection.execute("DELETE FROM plu_fts")
+                connection.execute(
+                    "INSERT INTO plu_fts (rowid, name, barcode) SELECT rowid, name, barCode FROM source.Tbl_Plu"
+                )
+                connection.execute(
+                    "INSERT OR REPLACE INTO source_state (path, fingerprint) VALUES (?, ?)",
+                    (self.db_path, fingerprint),
+                )
+        finally:
+            connection.execute("DETACH DATABASE source")
+        count = connection.execute("SELECT COUNT(*) FROM plu_fts").fetchone()[0]
+        self.logger.info(f"PLU search index built with {count} names.")
+
+    @staticmethod
+    def match_expression(text):
+        """Turn keywords into an FTS5 query where every keyword must match the start of a word."""
+        terms = []
+        for keyword in text.split():
+            terms.append('"' + keyword.replace('"', '""') + '"*')
+        return " AND ".join(terms)
+
+    def search(self, text, limit=None):
+        """
+        Return the barcodes whose name matches every keyword, best ranked first.
+
+        Returns None when the index cannot be used, so the caller can scan instead.
+        """
+        expression = self.match_expression(text)
+        if not expression or not self.ensure():
+            return None
+        sql = "SELECT barcode FROM plu_fts WHERE plu_fts MATCH ? ORDER BY bm25(plu_fts)"
+        params = [expression]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        connection = None
+        try:
+            connection = sqlite3.connect(self.path)
+            return [row[0] for row in connection.execute(sql, params)]
+        except sqlite3.Error as e:
+            self.logger.error(f"PLU full-text search failed: {e}")
+            return None
+        finally:
+            if connection:
+                connection.close()
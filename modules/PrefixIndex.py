@@ -0,0 +1,40 @@
+from bisect import bisect_left, bisect_right
+
+
+class PrefixIndex:
+    """
+    Row ids sorted by one lowercase catalog column, for exact and prefix lookups.
+
+    A lookup bisects the sorted row ids, comparing keys of the probed rows
+    only, so it takes O(log n + k) without building a key list per query.
+    The row ids and keys are the catalog's own permutation and key column of
+    the column, which the catalog keeps current on delta refreshes.
+    """
+
+    def __init__(self, catalog, column):
+        self.catalog = catalog
+        self.column = column
+        self.key = catalog.key_column(column).__getitem__
+
+    def order(self):
+        return self.catalog.permutation(self.column)
+
+    def _range(self, prefix):
+        order = self.order()
+        length = len(prefix)
+        start = bisect_left(order, prefix, key=self.key)
+        end = bisect_right(order, prefix, lo=start, key=lambda row_id: self.key(row_id)[:length])
+        return order, start, end
+
+    def prefix(self, prefix):
+        """Return the row ids whose key starts with prefix, in key order."""
+        order, start, end = self._range(prefix.lower())
+        return list(order[start:end])
+
+    def exact(self, key):
+        """Return the row ids whose key equals key."""
+        key = key.lower()
+        order = self.order()
+        start = bisect_left(order, key, key=self.key)
+        end = bisect_right(order, key, lo=start, key=self.key)
+        return list(order[start:end])
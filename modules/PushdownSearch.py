@@ -0,0 +1,161 @@
+import sqlite3
+import threading
+from modules.CatalogAdapter import SqlitePluAdapter
+from modules.logger_config import setup_logger
+
+
+class SqlServerPushdownSearch:
+    """
+    Search the SQL Server catalog with bounded queries instead of holding it in memory.
+
+    Used when the catalog is too large to load. Every search returns at most
+    limit rows with TOP, ordered by (barcode, item code, UOM), and the next page
+    is fetched with a keyset condition on the last row rather than an OFFSET,
+    so paging stays cheap however deep the user goes. Exact barcode lookups can
+    seek an index on ItemUOM.BarCode; description and item code searches use
+    LIKE and rely on TOP to stop early.
+
+    Rows are returned in CatalogStore.COLUMNS order.
+    """
+
+    source = "sqlserver"
+
+    BARCODE_EXPR = "ISNULL(NULLIF(u.BarCode, ''), i.ItemCode)"
+
+    SEARCH_SQL = """
+        SELECT TOP (?)
+            u.ItemCode,
+            i.Description AS DescriptionWithUOM,
+            u.UOM,
+            u.Price AS DefaultUnitPrice,
+            u.Cost,
+            {barcode} AS Barcode,
+            ISNULL(p.Location, 'HQ') AS Location,
+            ISNULL(p.Price, u.Price) AS PosUnitPrice
+        FROM dbo.ItemUOM u
+        LEFT JOIN dbo.Item i ON u.ItemCode = i.ItemCode
+        LEFT JOIN dbo.PosPricePlan p ON u.ItemCode = p.ItemCode AND p.Location = ?
+        WHERE {conditions}
+        ORDER BY Barcode, u.ItemCode, u.UOM;
+    """
+
+    def __init__(self, query, location):
+        self.logger = setup_logger("PushdownSearch")
+        self.query = query  # CatalogQuery, so searches share its pooled connection and timings
+        self.location = location
+        self.lock = threading.Lock()  # Pages are read by the search thread and by a print job, one at a time
+
+    def count(self):
+        return self.query.count_items()
+
+    @staticmethod
+    def like_prefix(text):
+        """Escape LIKE wildcards so text only matches as a literal prefix."""
+        return text.replace("[", "[[]").replace("%", "[%]").replace("_", "[_]") + "%"
+
+    def search(self, mode, text, limit, after=None):
+        """
+        Return (rows, next_key) for one page of results.
+
+        mode is 'all', 'barcode' (barcodes starting with text), 'description'
+        or 'item_code' (every keyword contained). Pass the returned next_key as after to get
+        the following page; it is None on the last page.
+        """
+        conditions = []
+        params = [limit, self.location]
+        keywords = text.lower().split()
+
+        if mode == 'barcode':
+            # Spelled out instead of comparing BARCODE_EXPR so a prefix LIKE can seek an index on BarCode
+            pattern = self.like_prefix(text)
+            conditions.append("(u.BarCode LIKE ? OR (NULLIF(u.BarCode, '') IS NULL AND i.ItemCode LIKE ?))")
+            params += [pattern, pattern]
+        elif mode == 'description':
+            for keyword in keywords:
+                conditions.append("i.Description LIKE ?")
+                params.append(f"%{keyword}%")
+        elif mode == 'item_code':
+            for keyword in keywords:
+                conditions.append("u.ItemCode LIKE ?")
+                params.append(f"%{keyword}%")
+
+        if after is not None:
+            barcode, item_code, uom = after
+            conditions.append(
+                f"({self.BARCODE_EXPR} > ? OR ({self.BARCODE_EXPR} = ? AND "
+                "(u.ItemCode > ? OR (u.ItemCode = ? AND u.UOM > ?))))"
+            )
+            params += [barcode, barcode, item_code, item_code, uom]
+
+        sql = self.SEARCH_SQL.format(barcode=self.BARCODE_EXPR, conditions=" AND ".join(conditions) or "1 = 1")
+        # Statement name includes the shape so each distinct SQL text keeps its own prepared cursor
+        name = f"pushdown_{mode}_{len(keywords)}_{after is not None}"
+        with self.lock:
+            rows = [tuple(row) for row in self.query.execute(name, sql, params).fetchall()]
+
+        next_key = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_key = (last[5], last[0], last[2])
+        self.logger.info(f"Pushdown {mode} search for '{text}' returned {len(rows)} rows.")
+        return rows, next_key
+
+
+class SqlitePushdownSearch:
+    """
+    Search a Tbl_Plu SQLite file with LIMIT and keyset pagination on (barCode, rowid).
+
+    A new connection is opened per search because sqlite3 connections cannot
+    be shared between the threads that run the searches.
+    """
+
+    source = SqlitePluAdapter.source
+
+    def __init__(self, db_path):
+        self.logger = setup_logger("PushdownSearch")
+        self.db_path = db_path
+        self.adapter = SqlitePluAdapter()
+
+    def count(self):
+        connection = sqlite3.connect(self.db_path)
+        try:
+            return connection.execute("SELECT COUNT(*) FROM Tbl_Plu;").fetchone()[0]
+        finally:
+            connection.close()
+
+    def search(self, mode, text, limit, after=None):
+        """Same contract as SqlServerPushdownSearch.search; item_code matches the barcode in Tbl_Plu."""
+        conditions = []
+        params = []
+        keywords = text.lower().split()
+
+        if mode == 'barcode':
+            conditions.append("barCode LIKE ? ESCAPE '\\'")
+            params.append(text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        elif mode in ('description', 'item_code'):
+            column = "name" if mode == 'description' else "barCode"
+            for keyword in keywords:
+                conditions.append(f"{column} LIKE ?")
+                params.append(f"%{keyword}%")
+
+        if after is not None:
+            barcode, rowid = after
+            conditions.append("(barCode > ? OR (barCode = ? AND rowid > ?))")
+            params += [barcode, barcode, rowid]
+
+        where = " AND ".join(conditions) or "1 = 1"
+        sql = f"SELECT barCode, name, price, rowid FROM Tbl_Plu WHERE {where} ORDER BY barCode, rowid LIMIT ?;"
+        params.append(limit)
+
+        connection = sqlite3.connect(self.db_path)
+        try:
+            raw_rows = connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+        rows = [self.adapter.to_row(row) for row in raw_rows]
+        next_key = None
+        if len(raw_rows) == limit:
+            next_key = (raw_rows[-1][0], raw_rows[-1][3])
+        self.logger.info(f"Pushdown {mode} search for '{text}' returned {len(rows)} rows.")
+        return rows, next_key
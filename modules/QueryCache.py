@@ -0,0 +1,78 @@
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    LRU cache of search results, keyed by search mode, normalized query and
+    catalog version.
+
+    Typing refines a query ("milk" -> "milk full"), and a refinement can only
+    match rows its parent matched. parent() finds the most specific cached
+    query the new one refines, so the caller filters those few rows instead
+    of searching the whole catalog. Backspacing returns to queries that are
+    still cached and answered by get() directly.
+
+    A new catalog version makes every older entry unreachable; they are
+    evicted as new results come in. Besides the number of entries, the total
+    number of cached row ids is bounded, since a one letter query can match
+    most of the catalog.
+    """
+
+    def __init__(self, capacity=64, max_rows=2000000):
+        self.capacity = capacity
+        self.max_rows = max_rows
+        self.rows = 0
+        self._entries = OrderedDict()  # (mode, query, version) -> (row ids, refinable)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def refines(query, parent, prefix):
+        """True when every row matching query also matches parent."""
+        if prefix:
+            return query.startswith(parent)
+        # Keyword searches match rows containing all keywords, so each parent keyword must be inside a new one
+        keywords = query.split()
+        return all(any(old in new for new in keywords) for old in parent.split())
+
+    def clear(self):
+        self._entries.clear()
+        self.rows = 0
+
+    def get(self, mode, query, version):
+        key = (mode, self.normalize(query), version)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, mode, query, version, row_ids, refinable=True):
+        """Cache row ids; refinable is False for results that are not a plain filter (ranked or fuzzy results)."""
+        if len(row_ids) > self.max_rows:
+            return
+        key = (mode, self.normalize(query), version)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.rows -= len(old[0])
+        self._entries[key] = (row_ids, refinable)
+        self.rows += len(row_ids)
+        while len(self._entries) > self.capacity or self.rows > self.max_rows:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.rows -= len(evicted)
+
+    def parent(self, mode, query, version, prefix=False):
+        """Return the smallest cached refinable result that query refines, or None."""
+        query = self.normalize(query)
+        best = None
+        for (entry_mode, entry_query, entry_version), (row_ids, refinable) in self._entries.items():
+            if (entry_mode == mode and entry_version == version and refinable and entry_query != query
+                    and self.refines(query, entry_query, prefix)
+                    and (best is None or len(row_ids) < len(best))):
+                best = row_ids
+        return best
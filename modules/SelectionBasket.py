@@ -0,0 +1,136 @@
+from modules.CatalogStore import CatalogStore
+
+
+class SelectionBasket:
+    """
+    Rows picked for printing, with their number of copies, kept across searches.
+
+    Entries are row ids of the basket's catalog, in the order they were
+    picked, so a new search only changes what the table shows. Printing
+    reads the rows from the catalog, never from the table.
+
+    Row ids are only stable within one catalog: when rows are replaced by a
+    refresh (update()) or another catalog is installed (rebase()), entries
+    are carried over by item code, UOM and barcode, and dropped when the
+    item is gone. Rows picked from another catalog, such as the pages of a
+    pushdown search, are copied into a small store of the basket's own.
+    """
+
+    def __init__(self):
+        self.catalog = None
+        self.copies = {}  # Row id -> copies
+        self._keys = None  # Row key -> row id, while the basket holds copied rows
+
+    def __len__(self):
+        return len(self.copies)
+
+    def __bool__(self):
+        return bool(self.copies)
+
+    @staticmethod
+    def row_key(catalog, row_id):
+        return catalog.item_code[row_id], catalog.uom[row_id], catalog.barcode[row_id]
+
+    def _own_row_id(self, catalog, row_id):
+        """Return the basket row id of a catalog row, or None when it is not in the basket."""
+        if catalog is self.catalog:
+            return row_id if row_id in self.copies else None
+        if self._keys is not None:
+            return self._keys.get(self.row_key(catalog, row_id))
+        return None
+
+    def get(self, catalog, row_id):
+        """Return the copies of a catalog row, or None when it is not in the basket."""
+        own = self._own_row_id(catalog, row_id)
+        return None if own is None else self.copies.get(own)
+
+    def set(self, catalog, row_id, copies=1):
+        """Put a catalog row in the basket, or change its copies."""
+        if not self.copies:
+            self.catalog = catalog
+            self._keys = None
+        if catalog is not self.catalog:
+            own = self._own_row_id(catalog, row_id)
+            if own is None:
+                own = self._copy_row(catalog, row_id)
+            row_id = own
+        self.copies[row_id] = copies
+
+    def remove(self, catalog, row_id):
+        own = self._own_row_id(catalog, row_id)
+        if own is not None:
+            self.copies.pop(own, None)
+            if self._keys is not None:
+                self._keys.pop(self.row_key(catalog, row_id), None)
+
+    def clear(self):
+        self.copies = {}
+        self._keys = None
+
+    def items(self):
+        """Return (row id, copies) of the basket's catalog, in the order they were picked."""
+        return list(self.copies.items())
+
+    def detach(self):
+        """Copy the rows in the basket into its own store, so it no longer depends on its catalog."""
+        if self._keys is not None or not self.copies:
+            return
+        store = CatalogStore(self.catalog.source)  # Only read by row id, so never sorted
+        copies = {}
+        self._keys = {}
+        for row_id, count in self.copies.items():
+            own = store.append(*self.catalog.record(row_id))
+            copies[own] = count
+            self._keys[self.row_key(self.catalog, row_id)] = own
+        self.catalog = store
+        self.copies = copies
+
+    def _copy_row(self, catalog, row_id):
+        self.detach()
+        own = self.catalog.append(*catalog.record(row_id))
+        self._keys[self.row_key(catalog, row_id)] = own
+        return own
+
+    def replace_catalog(self, old, new):
+        """Point the basket at new, a copy of old with the same row ids."""
+        if self.catalog is old:
+            self.catalog = new
+
+    def update(self, catalog, removed_row_ids, added_row_ids):
+        """Carry entries over the row ids returned by CatalogStore.replace_item_codes; returns how many were dropped."""
+        if catalog is not self.catalog:
+            return 0
+        removed = {row_id for row_id in removed_row_ids if row_id in self.copies}
+        if not removed:
+            return 0
+        added = {self.row_key(catalog, row_id): row_id for row_id in added_row_ids}
+        copies = {}
+        for row_id, count in self.copies.items():
+            if row_id in removed:
+                row_id = added.get(self.row_key(catalog, row_id))  # Removed rows keep their values
+                if row_id is None:
+                    continue
+            copies[row_id] = count
+        dropped = len(self.copies) - len(copies)
+        self.copies = copies
+        return dropped
+
+    def rebase(self, catalog):
+        """Move the entries onto another catalog; returns how many items it no longer has."""
+        if catalog is self.catalog or not self.copies:
+            self.catalog = catalog
+            return 0
+        wanted = {self.row_key(self.catalog, row_id): count for row_id, count in self.copies.items()}
+        item_codes = {key[0] for key in wanted}
+        found = {}
+        for row_id in catalog.ids():
+            if catalog.item_code[row_id] in item_codes:
+                key = self.row_key(catalog, row_id)
+                if key in wanted:
+                    found[key] = row_id
+        copies = {found[key]: count for key, count in wanted.items() if key in found}
+        dropped = len(self.copies) - len(copies)
+        self.catalog = catalog
+        self.copies = copies
+        self._keys = None
+        return dropped
@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+from multiprocessing import shared_memory
+
+
+_attached = {}  # Block name -> SharedMemory, attached once per worker process
+
+
+def _attach(name):
+    block = _attached.get(name)
+    if block is None:
+        block = shared_memory.SharedMemory(name=name)
+        _attached[name] = block
+    return block
+
+
+def _detach_except(names):
+    # Blocks of keys that were replaced are let go, so their memory can be freed
+    for name in [name for name in _attached if name not in names]:
+        _attached.pop(name).close()
+
+
+def _search_shard(task):
+    """
+    Return the row ids, in barcode order, of the shard positions whose key contains every keyword.
+
+    Runs in a worker process. The longest keyword is found in the shard's
+    UTF-8 bytes with bytes.find, so most rows are never looked at in
+    Python; each hit is mapped to its row through the offsets, and only
+    those rows are checked for the other keywords.
+    """
+    data_name, offsets_name, row_ids_name, start, end, keywords, live = task
+    _detach_except(live)
+    data = _attach(data_name).buf
+    offsets = _attach(offsets_name).buf.cast("Q")
+    row_ids = _attach(row_ids_name).buf.cast("I")
+    try:
+        base = offsets[start]
+        blob = bytes(data[base:offsets[end]])
+        encoded = sorted((keyword.encode("utf-8") for keyword in keywords), key=len, reverse=True)
+        first, rest = encoded[0], encoded[1:]
+
+        found = []
+        hit = blob.find(first)
+        while hit != -1:
+            position = bisect_right(offsets, base + hit, start, end + 1) - 1
+            row_start = offsets[position] - base
+            row_end = offsets[position + 1] - base
+            if hit + len(first) <= row_end:
+                value = blob[row_start:row_end]
+                if all(keyword in value for keyword in rest):
+                    found.append(row_ids[position])
+                hit = blob.find(first, row_end)  # One hit per row is enough
+            else:
+                hit = blob.find(first, hit + 1)  # The hit spans into the next row
+        return found
+    finally:
+        offsets.release()
+        row_ids.release()
+
+
+class SharedKeys:
+    """
+    The lowercase keys of a catalog's live rows, copied in barcode order into
+    shared memory for ShardedSearch: the UTF-8 bytes of each column, their
+    offsets and the row ids, with the positions split into shards.
+
+    close() frees the memory.
+    """
+
+    def __init__(self, catalog, columns, shard_count):
+        self.version = catalog.version
+        self.columns = {}
+        self.blocks = []
+        try:
+            ids = catalog.ids()
+            self.rows = len(ids)
+            row_ids = self._share(array('I', ids).tobytes())
+            for column in columns:
+                keys = catalog.key_column(column)
+                encoded = [keys[row_id].encode("utf-8") for row_id in ids]
+                offsets = array('Q', [0])
+                offsets.extend(accumulate(len(value) for value in encoded))
+                self.columns[column] = (self._share(b"".join(encoded)), self._share(offsets.tobytes()), row_ids)
+        except Exception:
+            self.close()
+            raise
+        count = max(1, min(self.rows, shard_count))
+        bounds = [self.rows * shard // count for shard in range(count + 1)]
+        self.shards = [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+        self.names = tuple(block.name for block in self.blocks)
+
+    def _share(self, data):
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        self.blocks.append(block)
+        block.buf[:len(data)] = data
+        return block.name
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+class ShardedSearch:
+    """
+    Substring search over the key columns of a large catalog, fanned out to a
+    pool of worker processes.
+
+    The keys are copied once into shared memory (SharedKeys), whose shards
+    the workers search in parallel, outside the GIL the UI thread needs,
+    reading the shared buffers without any copy of the catalog being
+    pickled. Shards keep the barcode order, so their results are merged by
+    concatenating them.
+
+    It covers the catalog as it was when its keys were copied. After the
+    rows change, copy_keys() copies them again, which may run on any thread
+    while searches go on, and swap() puts the copy in use; the worker
+    processes are kept, as starting them is the slow part. close() stops the
+    pool and frees the memory.
+    """
+
+    def __init__(self, catalog, columns, processes=None, shards_per_process=4):
+        processes = processes or max(2, min(8, (os.cpu_count() or 2) - 1))
+        self.shard_count = processes * shards_per_process
+        self.pool = None
+        self.keys = None
+        self.keys = self.copy_keys(catalog, columns)
+        try:
+            # Spawn like on Windows, so workers never inherit Qt state through fork
+            self.pool = multiprocessing.get_context("spawn").Pool(processes)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def version(self):
+        return self.keys.version
+
+    @property
+    def rows(self):
+        return self.keys.rows
+
+    @property
+    def columns(self):
+        return self.keys.columns
+
+    @property
+    def shards(self):
+        return self.keys.shards
+
+    def copy_keys(self, catalog, columns):
+        """Return the keys of catalog's columns in shared memory, for swap()."""
+        return SharedKeys(catalog, columns, self.shard_count)
+
+    def swap(self, keys):
+        """Search keys from now on and free the ones searched so far; not while a search runs."""
+        previous, self.keys = self.keys, keys
+        if previous is not None:
+            previous.close()
+
+    def search(self, column, keywords, cancelled=None):
+        """
+        Return the row ids whose key in column contains every keyword, in barcode order.
+
+        Returns None without keywords, or when cancelled() turns true while the
+        shards are being searched.
+        """
+        keywords = [keyword for keyword in keywords if keyword]
+        if not keywords:
+            return None
+        keys = self.keys
+        data, offsets, row_ids = keys.columns[column]
+        tasks = [(data, offsets, row_ids, start, end, keywords, keys.names) for start, end in keys.shards]
+        result = self.pool.map_async(_search_shard, tasks)
+        while not result.ready():
+            if cancelled is not None and cancelled():
+                return None  # The workers finish their shards, the results are dropped
+            result.wait(0.01)
+        found = []
+        for shard_rows in result.get():
+            found.extend(shard_rows)
+        return found
+
+    def close(self):
+        pool = getattr(self, "pool", None)
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+            self.pool = None
+        if self.keys is not None:
+            self.keys.close()
+            self.keys = None
@@ -0,0 +1,52 @@
+from array import array
+
+
+class SortIndex:
+    """
+    Dense ranks of the catalog rows by one column, for sorting results.
+
+    The ranks are read off the catalog's permutation of the column: rows
+    with equal keys share a rank, and a higher key gets the next rank. A
+    result is then sorted by comparing small ints instead of strings, and
+    sorting by several columns is one stable sort per column, least
+    significant first, with ties left to the next column.
+
+    The ranks describe the catalog version they were built for; current()
+    tells when a refresh or a location price switch has made them stale.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.catalog = None
+        self.version = None
+        self.ranks = array('I')
+
+    def current(self, catalog):
+        return catalog is self.catalog and catalog.version == self.version
+
+    def build(self, catalog, cancelled=None):
+        """Rank every live row; cancelled is polled now and then to abandon the build."""
+        ranks = array('I', bytes(4 * len(catalog.barcode)))  # Indexed by row id, dead rows included
+        key = catalog.sort_key(self.column)
+        rank = 0
+        previous = None
+        for count, row_id in enumerate(catalog.permutation(self.column)):
+            if cancelled is not None and count % 10000 == 0 and cancelled():
+                return None
+            value = key(row_id)
+            if rank == 0 or value != previous:
+                rank += 1
+                previous = value
+            ranks[row_id] = rank
+        self.ranks = ranks
+        self.catalog = catalog
+        self.version = catalog.version
+        return self
+
+    @staticmethod
+    def sort(row_ids, indexes):
+        """Return row_ids sorted by the columns of indexes, most significant first; ties keep their order."""
+        rows = list(row_ids)
+        for index in reversed(indexes):
+            rows.sort(key=index.ranks.__getitem__)
+        return rows
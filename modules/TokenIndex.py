@@ -0,0 +1,65 @@
+class TokenIndex:
+    """
+    Inverted index from the lowercase whitespace tokens of one catalog column
+    to posting lists of the row ids containing them.
+
+    Search keywords never contain whitespace, so a keyword is a substring of a
+    value exactly when it is a substring of one of its tokens. A keyword's
+    rows are therefore the postings of every vocabulary token containing it,
+    found by scanning the vocabulary, which is far smaller than the catalog.
+    The keywords' row sets are then intersected smallest first.
+
+    Rows removed by a refresh are only remembered as dead, and added rows are
+    appended to the postings, so a delta never needs a rebuild.
+    """
+
+    def __init__(self, column="description"):
+        self.column = column
+        self.postings = {}
+        self.dead = set()
+
+    def add(self, row_id, key):
+        for token in set(key.split()):
+            postings = self.postings.get(token)
+            if postings is None:
+                self.postings[token] = [row_id]
+            else:
+                postings.append(row_id)
+
+    def build(self, catalog, cancelled=None):
+        """Index every live row; cancelled is polled now and then to abandon the build early."""
+        keys = catalog.key_column(self.column)
+        for count, row_id in enumerate(catalog.ids()):
+            if cancelled is not None and count % 10000 == 0 and cancelled():
+                return None
+            self.add(row_id, keys[row_id])
+        return self
+
+    def update(self, catalog, removed_row_ids, added_row_ids):
+        """Apply the row ids returned by CatalogStore.replace_item_codes."""
+        self.dead.update(removed_row_ids)
+        keys = catalog.key_column(self.column)
+        for row_id in added_row_ids:
+            self.add(row_id, keys[row_id])
+
+    def _postings_containing(self, keyword):
+        return [postings for token, postings in self.postings.items() if keyword in token]
+
+    def search(self, keywords):
+        """Return the set of live row ids whose value contains every keyword, or None without keywords."""
+        keywords = set(keywords)
+        if not keywords:
+            return None
+
+        matches = [self._postings_containing(keyword) for keyword in keywords]
+        # Smallest first: the first set bounds the work of every intersection after it
+        matches.sort(key=lambda lists: sum(len(postings) for postings in lists))
+        row_ids = None
+        for lists in matches:
+            candidates = set()
+            for postings in lists:
+                candidates.update(postings)
+            row_ids = candidates if row_ids is None else row_ids & candidates
+            if not row_ids:
+                return set()
+        return row_ids - self.dead if self.dead else row_ids
@@ -30,6 +30,16 @@ def create_json_file():
         "tpslTemplate": "SPEED 2.0 \nDENSITY 7 \nDIRECTION 0 \nSIZE 35MM,25MM \nOFFSET 0.000 \nREFERENCE 0,0 \nCLS \nTEXT 320,5,\"2\",0,1,1,\"{{companyName}}\" \nTEXT 310,40,\"2\",0,1,1,\"{{barcode_value}}\" \nBLOCK 310,120,\"0\",0,1,1,\"{{description}}\" \nBARCODE 310,60,\"128\",50,0,0,2,10,\"{{barcode_value}}\" \nTEXT 310,160,\"4\",0,1,1,\"{{unit_price_integer}}\" \nPRINT {{copies}} \nEOP",
         "logging": True,
         "itemCount": 100,
+        "fetchBatchSize": 2000,
+        "useReplica": True,
+        "replicaPath": "C:/barcode",
+        "deltaRefreshInterval": 60,
+        "poolMaxSize": 4,
+        "poolIdleTimeout": 300,
+        "pushdownThreshold": 1000000,
+        "useSnapshot": True,
+        "useFullTextSearch": True,
+        "shardedSearchThreshold": 500000,
         "enterToSearch": True,
         "useGenericDriver": True,
         "printerName": "TSC_TA200",